@@ -0,0 +1,188 @@
+import argparse
+import json
+import math
+import time
+import numpy as np
+from common.metrics import format_summary
+from system.batch import BatchProcessor
+from system.camera import CameraProcessor
+from system.recording import SessionReplaySource
+from system.resolution import ResolutionController
+from system.main import build_fsm
+
+RESULT_KEYS = ("robot_center_uv", "robot_heading_rad", "target_center_uv", "distance_px", "angle_to_target_deg")
+FLOAT_TOLERANCE = 1e-6
+
+def run_replay(frames, processor: CameraProcessor):
+    fsm = build_fsm()
+    outputs = []
+    latencies_ns = np.empty(len(frames), dtype=np.int64)
+
+    for i, frame in enumerate(frames):
+        started_ns = time.perf_counter_ns()
+        results = processor.get_processing_results(frame.image)
+        action = fsm.process_measurement(results.get("angle_to_target_deg"), results.get("distance_px"))
+        latencies_ns[i] = time.perf_counter_ns() - started_ns
+
+        output = {key: results.get(key) for key in RESULT_KEYS}
+        output["process_width"] = results.get("process_width")
+        output["fsm_state"] = fsm.get_current_state_name()
+        output["fsm_action"] = action.command
+        outputs.append(output)
+
+    return outputs, latencies_ns
+
+def _values_match(expected, actual) -> bool:
+    if isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        return len(expected) == len(actual) and all(_values_match(e, a) for e, a in zip(expected, actual))
+    if isinstance(expected, float) or isinstance(actual, float):
+        if expected is None or actual is None:
+            return False
+        return math.isclose(expected, actual, rel_tol=FLOAT_TOLERANCE, abs_tol=FLOAT_TOLERANCE)
+    return expected == actual
+
+def compare_with_baseline(outputs, baseline):
+    mismatches = []
+    if len(outputs) != len(baseline):
+        mismatches.append(f"frame count: expected {len(baseline)}, got {len(outputs)}")
+    for i, (expected, actual) in enumerate(zip(baseline, outputs)):
+        for key, expected_value in expected.items():
+            if not _values_match(expected_value, actual.get(key)):
+                mismatches.append(f"frame {i}, {key}: expected {expected_value}, got {actual.get(key)}")
+    return mismatches
+
+def print_latency_report(latencies_ns):
+    latencies_ms = latencies_ns / 1e6
+    total_s = latencies_ns.sum() / 1e9
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    print(f"Кадров: {len(latencies_ns)}, FPS: {len(latencies_ns) / total_s:.1f}")
+    print(f"Задержка на кадр: p50={p50:.2f} ms, p95={p95:.2f} ms, p99={p99:.2f} ms, max={latencies_ms.max():.2f} ms")
+
+def build_processor(args, blob_method: str | None = None) -> CameraProcessor:
+    resolution_controller = None
+    if args.target_fps:
+        resolution_controller = ResolutionController(widths=args.widths, target_fps=args.target_fps)
+    return CameraProcessor(debug=False, process_frame_width=args.width, tracking=args.tracking,
+                           profile=args.profile, blob_method=blob_method or args.blob_method,
+                           resolution_controller=resolution_controller, pyramid_refine=args.pyramid)
+
+def run_batch(frames, processor: CameraProcessor, workers: int | None):
+    """
+    Processes the whole session with BatchProcessor and replays the FSM over
+    its columnar results, giving outputs comparable with run_replay().
+    """
+    batch = BatchProcessor(processor, workers=workers)
+    started_ns = time.perf_counter_ns()
+    results = batch.process(np.stack([frame.image for frame in frames]))
+    elapsed_s = (time.perf_counter_ns() - started_ns) / 1e9
+    print(f"Пакетная обработка: {len(frames)} кадров за {elapsed_s:.2f} с, {len(frames) / elapsed_s:.1f} кадров/с")
+
+    fsm = build_fsm()
+    outputs = []
+    for record in results.to_records():
+        action = fsm.process_measurement(record["angle_to_target_deg"], record["distance_px"])
+        output = {key: record[key] for key in RESULT_KEYS}
+        output["fsm_state"] = fsm.get_current_state_name()
+        output["fsm_action"] = action.command
+        outputs.append(output)
+    return outputs
+
+def compare_blob_methods(args, frames):
+    """
+    Replays the frames with every blob extraction method and reports their
+    latency and how far their results drift from the contour method.
+    """
+    reference = None
+    for blob_method in (CameraProcessor.BLOB_METHOD_CONTOURS, CameraProcessor.BLOB_METHOD_COMPONENTS):
+        for _ in range(args.warmup):
+            build_processor(args, blob_method).get_processing_results(frames[0].image)
+        outputs, latencies_ns = run_replay(frames, build_processor(args, blob_method))
+        print(f"Метод {blob_method}:")
+        print_latency_report(latencies_ns)
+        if reference is None:
+            reference = outputs
+            continue
+
+        center_errors = [math.dist(expected["robot_center_uv"], actual["robot_center_uv"])
+                         for expected, actual in zip(reference, outputs)
+                         if expected["robot_center_uv"] is not None and actual["robot_center_uv"] is not None]
+        detection_changes = sum((expected["robot_center_uv"] is None) != (actual["robot_center_uv"] is None)
+                                for expected, actual in zip(reference, outputs))
+        action_changes = sum(expected["fsm_action"] != actual["fsm_action"] for expected, actual in zip(reference, outputs))
+        max_error = max(center_errors, default=0.0)
+        print(f"Отличия от {CameraProcessor.BLOB_METHOD_CONTOURS}: центр робота до {max_error:.2f} px, "
+              f"обнаружение в {detection_changes} кадрах, действие FSM в {action_changes} кадрах")
+    return 0
+
+def run_benchmark(args):
+    source = SessionReplaySource(args.session_dir)
+    if not source.isOpened():
+        print(f"Ошибка: В {args.session_dir} нет записанных кадров.")
+        return 1
+    frames = source.load_all()
+    if args.compare_blob_methods:
+        return compare_blob_methods(args, frames)
+    if args.batch:
+        outputs = run_batch(frames, build_processor(args), args.batch_workers)
+        return check_outputs(args, outputs)
+
+    for _ in range(args.warmup):
+        build_processor(args).get_processing_results(frames[0].image)
+    processor = build_processor(args)
+
+    outputs, latencies_ns = run_replay(frames, processor)
+    print_latency_report(latencies_ns)
+    if processor.resolution_controller is not None:
+        widths, counts = np.unique([output["process_width"] for output in outputs], return_counts=True)
+        print("Кадров по ширине обработки: " + ", ".join(f"{w}: {c}" for w, c in zip(widths, counts)))
+    if args.profile:
+        print("Время стадий обработки кадра:")
+        for line in format_summary(processor.get_profile_summary()):
+            print(f"    {line}")
+
+    return check_outputs(args, outputs)
+
+def check_outputs(args, outputs):
+    # JSON round trip turns tuples into lists, so both sides compare alike
+    outputs = json.loads(json.dumps(outputs))
+    if args.write_baseline:
+        with open(args.write_baseline, "w") as baseline_file:
+            json.dump(outputs, baseline_file, indent=1)
+        print(f"Эталон записан: {args.write_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        mismatches = compare_with_baseline(outputs, baseline)
+        if mismatches:
+            print(f"Расхождения с эталоном: {len(mismatches)}")
+            for mismatch in mismatches[:20]:
+                print(f"    {mismatch}")
+            return 1
+        print("Результаты совпадают с эталоном.")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Воспроизведение записанной сессии через CameraProcessor и FSM")
+    parser.add_argument("session_dir", help="Каталог сессии, записанной check/record.py")
+    parser.add_argument("--baseline", help="JSON с эталонными результатами для сравнения")
+    parser.add_argument("--write-baseline", help="Сохранить результаты прогона как эталон")
+    parser.add_argument("--width", type=int, default=640, help="process_frame_width")
+    parser.add_argument("--tracking", action="store_true", help="Включить ROI-трекинг")
+    parser.add_argument("--profile", action="store_true", help="Замерить время отдельных стадий обработки")
+    parser.add_argument("--target-fps", type=float,
+                        help="Подбирать ширину обработки из --widths, чтобы держать эту частоту кадров")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(ResolutionController.DEFAULT_WIDTHS),
+                        help="Ширины обработки для --target-fps")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="Уточнять маркеры в полном разрешении вокруг найденных на уменьшенном кадре")
+    parser.add_argument("--blob-method", default=CameraProcessor.BLOB_METHOD_CONTOURS,
+                        choices=(CameraProcessor.BLOB_METHOD_CONTOURS, CameraProcessor.BLOB_METHOD_COMPONENTS),
+                        help="Способ выделения маркера на маске")
+    parser.add_argument("--compare-blob-methods", action="store_true",
+                        help="Сравнить скорость и результаты всех способов выделения маркера")
+    parser.add_argument("--batch", action="store_true",
+                        help="Обработать сессию пакетно (system/batch.py) вместо покадровой обработки")
+    parser.add_argument("--batch-workers", type=int, help="Число потоков пакетной обработки")
+    parser.add_argument("--warmup", type=int, default=5, help="Число прогревочных кадров")
+    raise SystemExit(run_benchmark(parser.parse_args()))
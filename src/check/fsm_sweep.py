@@ -0,0 +1,35 @@
+import argparse
+import numpy as np
+from system.sweep import load_control_trace, sweep_fsm
+
+def parse_range(text: str) -> np.ndarray:
+    start, stop, count = text.split(":")
+    return np.linspace(float(start), float(stop), int(count))
+
+def main(args):
+    angles, distances = load_control_trace(args.records, args.robot)
+    if len(angles) == 0:
+        print(f"В {args.records} нет записей управления робота {args.robot}")
+        return
+    distance_tolerances = parse_range(args.distance_tolerance)
+    straight_angle_thresholds = parse_range(args.straight_angle_threshold)
+    results = sweep_fsm(angles, distances, distance_tolerances, straight_angle_thresholds)
+    print(f"Шагов в записи: {len(angles)} (без измерения: {int(np.isnan(angles).sum())}), "
+          f"комбинаций порогов: {results.goal_step.size}")
+    reached = int((results.goal_step >= 0).sum())
+    print(f"Цель достигнута в {reached} из {results.goal_step.size} комбинаций")
+    for row in results.best(args.top):
+        goal = row["goal_step"] if row["goal_step"] >= 0 else "-"
+        states = ", ".join(f"{name} {count}" for name, count in row["steps_in_state"].items())
+        print(f"    distance_tolerance {row['distance_tolerance']:7.1f}  "
+              f"straight_angle_threshold {row['straight_angle_threshold']:5.1f}  "
+              f"цель на шаге {goal}, смен состояния {row['state_changes']} ({states})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перебор порогов FSM навигации на записанной трассе угла и расстояния")
+    parser.add_argument("records", help="Файл записей управления (runtime_records.jsonl, сохраняется по SIGUSR1)")
+    parser.add_argument("--robot", default="robot", help="Имя робота в записях")
+    parser.add_argument("--distance-tolerance", default="5:100:96", help="Диапазон distance_tolerance: начало:конец:количество")
+    parser.add_argument("--straight-angle-threshold", default="2:60:59", help="Диапазон straight_angle_threshold, градусы: начало:конец:количество")
+    parser.add_argument("--top", type=int, default=10, help="Сколько лучших комбинаций вывести")
+    main(parser.parse_args())
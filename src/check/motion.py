@@ -0,0 +1,166 @@
+import argparse
+import math
+from collections import deque
+from common.command import Command, CommandWithArguments
+from common.drive import differential_mix
+from system.control import RobotNavigationFSM, RobotStates
+from system.estimation import PoseEstimator
+from system.dispatch import CommandDispatcher
+from system.fleet import RobotChannel
+from system import main as config
+
+LEGACY_ACTION_DURATION_S = 0.25
+LEGACY_DRIVE = {
+    Command.MOVE_FORWARD: (1.0, 0.0),
+    Command.TURN_LEFT: (0.0, 1.0),
+    Command.TURN_RIGHT: (0.0, -1.0),
+}
+SCENARIOS = (
+    ((100.0, 400.0), 0.0, (500.0, 150.0)),
+    ((320.0, 240.0), math.pi, (560.0, 260.0)),
+    ((80.0, 80.0), -math.pi / 2, (520.0, 420.0)),
+)
+
+class SimulatedRobot:
+    """
+    Differential-drive kinematics in image pixels. turn > 0 (as Engine.turn_left)
+    rotates the heading counterclockwise, the convention of compute_target_geometry.
+    """
+
+    def __init__(self, position, heading_rad, max_wheel_speed_px_s, wheel_base_px):
+        self.x, self.y = position
+        self.heading = heading_rad
+        self.max_wheel_speed = max_wheel_speed_px_s
+        self.wheel_base = wheel_base_px
+        self.wheels = (0.0, 0.0)
+        self.stop_at = 0.0
+
+    def apply(self, command: CommandWithArguments, now: float):
+        if command.command == Command.STOP:
+            self.wheels = (0.0, 0.0)
+            return
+        if command.command == Command.DRIVE:
+            speed, turn = command.args.get("speed", 0.0), command.args.get("turn", 0.0)
+        else:
+            speed, turn = LEGACY_DRIVE[command.command]
+        self.wheels = differential_mix(speed, turn)
+        self.stop_at = now + command.args.get("duration", LEGACY_ACTION_DURATION_S)
+
+    def step(self, now: float, dt: float) -> float:
+        if now >= self.stop_at:
+            self.wheels = (0.0, 0.0)
+        left, right = (wheel * self.max_wheel_speed for wheel in self.wheels)
+        linear = (left + right) / 2
+        self.heading += (left - right) / self.wheel_base * dt
+        self.x += linear * math.cos(self.heading) * dt
+        self.y -= linear * math.sin(self.heading) * dt
+        return abs(linear) * dt
+
+class DelayedSender:
+    def __init__(self, robot: SimulatedRobot, latency_s: float):
+        self.robot = robot
+        self.latency_s = latency_s
+        self.now = 0.0
+        self.in_flight = deque()
+        self.commands_sent = 0
+
+    def send(self, command: Command | CommandWithArguments, topic: str | None = None, on_result=None) -> bool:
+        if isinstance(command, Command):
+            command = CommandWithArguments(command=command)
+        self.in_flight.append((self.now + self.latency_s, command))
+        self.commands_sent += 1
+        if on_result is not None:
+            on_result(True)
+        return True
+
+    def deliver(self, now: float):
+        while self.in_flight and self.in_flight[0][0] <= now:
+            self.robot.apply(self.in_flight.popleft()[1], now)
+
+def build_channel(proportional: bool) -> RobotChannel:
+    fsm = RobotNavigationFSM(angle_tolerance=config.FSM_ANGLE_TOLERANCE_DEG,
+                             distance_tolerance=config.FSM_DISTANCE_TOLERANCE_PX,
+                             turn_speed=config.FSM_TURN_SPEED,
+                             move_speed=config.FSM_MOVE_SPEED,
+                             straight_angle_threshold=config.FSM_STRAIGHT_MOVE_ANGLE_THRESHOLD_DEG,
+                             proportional=proportional)
+    return RobotChannel(name="robot", topic="sim", fsm=fsm,
+                        estimator=PoseEstimator(max_gap_s=config.ESTIMATOR_MAX_GAP_S,
+                                                actuation_latency_s=config.ACTUATION_LATENCY_S),
+                        dispatcher=CommandDispatcher(
+                            keepalive_interval_s=config.DRIVE_KEEPALIVE_INTERVAL_S if proportional
+                            else config.COMMAND_SEND_INTERVAL_S,
+                            burst=config.COMMAND_KEEPALIVE_BURST),
+                        drive_command_duration_s=config.DRIVE_COMMAND_DURATION_S if proportional else None,
+                        steering_gain_per_deg=config.DRIVE_STEERING_GAIN_PER_DEG)
+
+def simulate(scenario, proportional: bool, args) -> dict:
+    start, heading, target = scenario
+    robot = SimulatedRobot(start, heading, args.wheel_speed, args.wheel_base)
+    sender = DelayedSender(robot, args.network_latency)
+    channel = build_channel(proportional)
+
+    dt = 0.001
+    frame_period = 1.0 / args.fps
+    control_period = 1.0 / config.CONTROL_RATE_HZ
+    pending_frames = deque()
+    next_frame = next_control = 0.0
+    goal_time = None
+    reached_tolerance = False
+    overshoot = 0.0
+    now = 0.0
+
+    while now < args.time_limit:
+        if now >= next_frame:
+            pending_frames.append((now, {"robots": {"robot": {
+                "robot_center_uv": (robot.x, robot.y),
+                "robot_heading_rad": robot.heading,
+                "target_center_uv": target,
+            }}}))
+            next_frame += frame_period
+        while pending_frames and pending_frames[0][0] + args.camera_latency <= now:
+            channel.update(*reversed(pending_frames.popleft()))
+        if now >= next_control:
+            sender.now = now
+            channel.control_step(sender, now)
+            next_control += control_period
+            if goal_time is None and channel.fsm.current_state_enum == RobotStates.GOAL_REACHED:
+                goal_time = now
+        sender.deliver(now)
+        travelled = robot.step(now, dt)
+        # Перебег - путь, пройденный после фактического входа в зону допуска вокруг цели
+        if reached_tolerance:
+            overshoot += travelled
+        elif math.hypot(target[0] - robot.x, target[1] - robot.y) <= config.FSM_DISTANCE_TOLERANCE_PX:
+            reached_tolerance = True
+        if goal_time is not None and robot.wheels == (0.0, 0.0) and not sender.in_flight:
+            break
+        now += dt
+
+    return {
+        "time_to_goal_s": goal_time,
+        "overshoot_px": overshoot,
+        "final_distance_px": math.hypot(target[0] - robot.x, target[1] - robot.y),
+        "commands": sender.commands_sent,
+    }
+
+def format_result(result: dict) -> str:
+    goal = f"{result['time_to_goal_s']:.2f} s" if result["time_to_goal_s"] is not None else "не достигнута"
+    return (f"цель: {goal}, перебег: {result['overshoot_px']:.1f} px, "
+            f"итоговое расстояние: {result['final_distance_px']:.1f} px, команд: {result['commands']}")
+
+def run(args):
+    for i, scenario in enumerate(SCENARIOS):
+        print(f"Сценарий {i + 1}: старт {scenario[0]}, цель {scenario[2]}")
+        print(f"    импульсы:        {format_result(simulate(scenario, False, args))}")
+        print(f"    пропорционально: {format_result(simulate(scenario, True, args))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение импульсного и пропорционального управления на кинематической модели робота")
+    parser.add_argument("--wheel-speed", type=float, default=150.0, help="Скорость колеса на полной мощности, px/s")
+    parser.add_argument("--wheel-base", type=float, default=120.0, help="Расстояние между колёсами, px")
+    parser.add_argument("--fps", type=float, default=30.0, help="Частота кадров камеры")
+    parser.add_argument("--camera-latency", type=float, default=0.05, help="Задержка от захвата кадра до результата, s")
+    parser.add_argument("--network-latency", type=float, default=0.02, help="Задержка доставки команды, s")
+    parser.add_argument("--time-limit", type=float, default=60.0, help="Максимальное время симуляции, s")
+    run(parser.parse_args())
@@ -0,0 +1,36 @@
+import argparse
+import time
+from system.capture import FrameGrabber
+from system.recording import SessionRecorder
+
+def record_session(session_dir: str, duration_s: float | None, source=0):
+    grabber = FrameGrabber(source=source)
+    if not grabber.start():
+        print("Ошибка: Не удалось открыть веб-камеру.")
+        return
+
+    recorder = SessionRecorder(session_dir)
+    recorder.open()
+    started_at = time.monotonic()
+
+    try:
+        while grabber.running:
+            if duration_s is not None and time.monotonic() - started_at >= duration_s:
+                break
+            captured = grabber.read(timeout=1.0)
+            if captured is not None:
+                recorder.write(captured)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grabber.stop()
+        recorder.close()
+        print(f"Записано кадров: {recorder.frames_written}, статистика захвата: {grabber.get_stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запись кадров с веб-камеры для последующего воспроизведения")
+    parser.add_argument("session_dir", help="Каталог для записи сессии")
+    parser.add_argument("--duration", type=float, default=None, help="Длительность записи в секундах (по умолчанию до Ctrl+C)")
+    parser.add_argument("--camera", type=int, default=0, help="Индекс камеры")
+    args = parser.parse_args()
+    record_session(args.session_dir, args.duration, source=args.camera)
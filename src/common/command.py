@@ -7,6 +7,8 @@ class Command(Enum):
     TURN_RIGHT = "turn_right"
     TURN_LEFT = "turn_left"
     STOP = "stop"
+    DRIVE = "drive"
+    HEARTBEAT = "heartbeat"
 
 @dataclass
 class CommandWithArguments:
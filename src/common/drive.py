@@ -0,0 +1,14 @@
+def differential_mix(speed: float, turn: float) -> tuple[float, float]:
+    """
+    Converts a forward speed and a turn rate, both in [-1, 1], into speeds of
+    the left and right wheel channels. turn > 0 turns the same way as
+    Engine.turn_left. If a wheel would exceed full speed, both are scaled
+    down together so the turning radius is kept.
+    """
+    left = speed + turn
+    right = speed - turn
+    peak = max(abs(left), abs(right))
+    if peak > 1.0:
+        left /= peak
+        right /= peak
+    return left, right
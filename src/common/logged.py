@@ -1,4 +1,5 @@
 import sys
+import time
 from loguru import logger
 
 class LoggedClass(object):
@@ -6,7 +7,12 @@ class LoggedClass(object):
         self.logger = logger.bind(classname=self.__class__.__name__)
 
 
-def configure_logger():
+def configure_logger(level: str = "INFO", enqueue: bool = False):
+    """
+    enqueue=True hands records to a background thread that does the
+    formatting and the stdout write, so logging calls on hot paths only pay
+    for putting the record on a queue.
+    """
     logger_format = (
         "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
         "<level>{level: <8}</level> | "
@@ -14,7 +20,50 @@ def configure_logger():
         "[{extra[classname]}] <level>{message}</level>"
     )
     logger.remove()
+    logger.configure(extra={"classname": "-"})
     logger.add(
         sys.stdout,
-        format=logger_format
-    )
\ No newline at end of file
+        format=logger_format,
+        level=level,
+        enqueue=enqueue
+    )
+
+
+class ThrottledLogger:
+    """
+    Rate limit for messages from per-frame and per-command paths: at most one
+    message per key every interval_s gets through, and it reports how many
+    were dropped since the previous one. Arguments are formatted lazily by
+    loguru ("{}" placeholders), so dropped messages cost no formatting.
+    """
+
+    def __init__(self, bound_logger, interval_s: float = 1.0):
+        self._logger = bound_logger
+        self.interval_s = interval_s
+        self._last_emit: dict[str, float] = {}
+        self._dropped: dict[str, int] = {}
+
+    def _log(self, depth: int, level: str, key: str, message: str, *args, **kwargs) -> bool:
+        now = time.monotonic()
+        last = self._last_emit.get(key)
+        if last is not None and now - last < self.interval_s:
+            self._dropped[key] = self._dropped.get(key, 0) + 1
+            return False
+        self._last_emit[key] = now
+        dropped = self._dropped.pop(key, 0)
+        if dropped:
+            message = f"{message} (+{dropped} suppressed)"
+        self._logger.opt(depth=depth).log(level, message, *args, **kwargs)
+        return True
+
+    def log(self, level: str, key: str, message: str, *args, **kwargs) -> bool:
+        return self._log(2, level, key, message, *args, **kwargs)
+
+    def debug(self, key: str, message: str, *args, **kwargs) -> bool:
+        return self._log(2, "DEBUG", key, message, *args, **kwargs)
+
+    def info(self, key: str, message: str, *args, **kwargs) -> bool:
+        return self._log(2, "INFO", key, message, *args, **kwargs)
+
+    def warning(self, key: str, message: str, *args, **kwargs) -> bool:
+        return self._log(2, "WARNING", key, message, *args, **kwargs)
@@ -0,0 +1,152 @@
+import json
+import time
+from collections import deque
+
+
+class LatencyHistogram:
+    """
+    Fixed-size log-linear histogram of durations in nanoseconds: every power
+    of two is split into 2 ** SUB_BUCKET_BITS buckets, so percentiles are
+    accurate to about 12% while recording costs a few integer operations.
+    """
+    SUB_BUCKET_BITS = 3
+    BUCKET_COUNT = 320
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def _bucket_index(self, duration_ns: int) -> int:
+        sub_buckets = 1 << self.SUB_BUCKET_BITS
+        if duration_ns < sub_buckets:
+            return max(duration_ns, 0)
+        shift = duration_ns.bit_length() - self.SUB_BUCKET_BITS - 1
+        index = ((shift + 1) << self.SUB_BUCKET_BITS) + (duration_ns >> shift) - sub_buckets
+        return min(index, self.BUCKET_COUNT - 1)
+
+    def _bucket_upper_bound(self, index: int) -> int:
+        sub_buckets = 1 << self.SUB_BUCKET_BITS
+        if index < sub_buckets:
+            return index + 1
+        shift = (index >> self.SUB_BUCKET_BITS) - 1
+        mantissa = (index & (sub_buckets - 1)) + sub_buckets
+        return (mantissa + 1) << shift
+
+    def record(self, duration_ns: int) -> None:
+        self.counts[self._bucket_index(duration_ns)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile(self, q: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= rank:
+                return min(self._bucket_upper_bound(index), self.max_ns)
+        return self.max_ns
+
+    def reset(self) -> None:
+        self.counts = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def summary(self) -> dict:
+        mean_ns = self.total_ns / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "mean_ms": mean_ns / 1e6,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p95_ms": self.percentile(95) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+
+class StageProfiler:
+    """
+    Times consecutive stages of a pipeline: start() marks the beginning of an
+    iteration, lap(stage) charges the time since the previous mark to that
+    stage, and finish() records the whole iteration as "total". When disabled
+    every call returns after a single attribute check.
+    """
+    TOTAL_STAGE = "total"
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self._started_ns = 0
+        self._last_ns = 0
+
+    def _record(self, stage: str, duration_ns: int) -> None:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(duration_ns)
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self._started_ns = self._last_ns = time.perf_counter_ns()
+
+    def lap(self, stage: str) -> None:
+        if not self.enabled:
+            return
+        now_ns = time.perf_counter_ns()
+        self._record(stage, now_ns - self._last_ns)
+        self._last_ns = now_ns
+
+    def finish(self) -> None:
+        if not self.enabled:
+            return
+        now_ns = time.perf_counter_ns()
+        self._record(self.TOTAL_STAGE, now_ns - self._started_ns)
+        self._last_ns = now_ns
+
+    def reset(self) -> None:
+        self.histograms.clear()
+
+    def summary(self) -> dict[str, dict]:
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+
+def format_summary(summary: dict[str, dict]) -> list[str]:
+    lines = []
+    for name, stats in summary.items():
+        lines.append(f"{name:<12} n={stats['count']:<7} mean={stats['mean_ms']:.3f} ms  "
+                     f"p50={stats['p50_ms']:.3f}  p95={stats['p95_ms']:.3f}  "
+                     f"p99={stats['p99_ms']:.3f}  max={stats['max_ms']:.3f}")
+    return lines
+
+
+class RecordRing:
+    """
+    The last `capacity` structured records (plain dicts) kept in memory.
+    Appending is a deque append with no I/O; dump() writes the current
+    contents as JSON lines when someone asks for them.
+    """
+
+    def __init__(self, capacity: int = 2000):
+        self.records: deque[dict] = deque(maxlen=capacity)
+        self.appended = 0
+
+    def append(self, record: dict) -> None:
+        self.records.append(record)
+        self.appended += 1
+
+    def snapshot(self) -> list[dict]:
+        return list(self.records)
+
+    def dump(self, path: str) -> int:
+        records = self.snapshot()
+        with open(path, "w") as dump_file:
+            for record in records:
+                dump_file.write(json.dumps(record, default=str) + "\n")
+        return len(records)
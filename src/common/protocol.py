@@ -0,0 +1,102 @@
+import math
+import random
+import struct
+from dataclasses import dataclass
+
+from common.command import Command, CommandWithArguments
+
+PROTOCOL_VERSION = 1
+
+# version, opcode, session, sequence, send timestamp, duration, speed, turn
+PACKET_FORMAT = struct.Struct("<BBHIdfff")
+
+OPCODES = {
+    Command.MOVE_FORWARD: 1,
+    Command.TURN_RIGHT: 2,
+    Command.TURN_LEFT: 3,
+    Command.STOP: 4,
+    Command.DRIVE: 5,
+    Command.HEARTBEAT: 6,
+}
+COMMANDS_BY_OPCODE = {opcode: command for command, opcode in OPCODES.items()}
+
+ARGUMENT_FIELDS = ("duration", "speed", "turn")
+
+
+@dataclass
+class CommandPacket:
+    command: CommandWithArguments
+    session: int
+    sequence: int
+    timestamp: float
+
+
+def new_session_id() -> int:
+    return random.randrange(1, 1 << 16)
+
+
+def encode_command(command: CommandWithArguments, session: int, sequence: int, timestamp: float) -> bytes:
+    """
+    Packs a command into the fixed 28-byte wire format. Arguments that are not
+    set travel as NaN and are left out of args on the receiving side.
+    """
+    arguments = [float(command.args.get(name, math.nan)) for name in ARGUMENT_FIELDS]
+    return PACKET_FORMAT.pack(PROTOCOL_VERSION, OPCODES[command.command], session,
+                              sequence & 0xFFFFFFFF, timestamp, *arguments)
+
+
+def decode_command(payload: bytes) -> CommandPacket:
+    if len(payload) != PACKET_FORMAT.size:
+        raise ValueError(f"Unexpected packet size {len(payload)}, expected {PACKET_FORMAT.size}")
+    version, opcode, session, sequence, timestamp, *arguments = PACKET_FORMAT.unpack(payload)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version {version}")
+    if opcode not in COMMANDS_BY_OPCODE:
+        raise ValueError(f"Unknown opcode {opcode}")
+    args = {name: value for name, value in zip(ARGUMENT_FIELDS, arguments) if not math.isnan(value)}
+    return CommandPacket(
+        command=CommandWithArguments(command=COMMANDS_BY_OPCODE[opcode], args=args),
+        session=session,
+        sequence=sequence,
+        timestamp=timestamp,
+    )
+
+
+class StaleCommandFilter:
+    """
+    Rejects packets that arrive out of order or were sent more than
+    max_age_s ago. A new sender session (e.g. after a restart of the control
+    program) resets the sequence tracking. The age check compares clocks of
+    two hosts, so they need to be NTP-synchronised; max_age_s=None disables it.
+    """
+    DEFAULT_MAX_AGE_S = 0.5
+
+    def __init__(self, max_age_s: float | None = DEFAULT_MAX_AGE_S):
+        self.max_age_s = max_age_s
+        self._session: int | None = None
+        self._last_sequence: int | None = None
+
+        self.accepted = 0
+        self.rejected_out_of_order = 0
+        self.rejected_stale = 0
+
+    def accept(self, packet: CommandPacket, now: float) -> bool:
+        if packet.session == self._session and self._last_sequence is not None \
+                and packet.sequence <= self._last_sequence:
+            self.rejected_out_of_order += 1
+            return False
+        if self.max_age_s is not None and now - packet.timestamp > self.max_age_s:
+            self.rejected_stale += 1
+            return False
+
+        self._session = packet.session
+        self._last_sequence = packet.sequence
+        self.accepted += 1
+        return True
+
+    def get_stats(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "rejected_out_of_order": self.rejected_out_of_order,
+            "rejected_stale": self.rejected_stale,
+        }
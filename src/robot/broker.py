@@ -1,38 +1,52 @@
+import time
 from typing import Callable
 import paho.mqtt.client as mqtt
-from common.logged import LoggedClass
+from common.logged import LoggedClass, ThrottledLogger
+from common.protocol import decode_command, StaleCommandFilter
 
 class CommandReciever(LoggedClass):
     DEFAULT_MQTT_HOST = "localhost"
     DEFAULT_MQTT_PORT = 1883
     DEFAULT_COMMAND_TOPIC = "robot/command"
     DEFAULT_CLIENT_ID = "robot_receiver"
+    MIN_RECONNECT_DELAY_S = 1
+    MAX_RECONNECT_DELAY_S = 8
 
     def __init__(self, 
                  host: str = DEFAULT_MQTT_HOST, 
                  port: int = DEFAULT_MQTT_PORT,
                  client_id: str = DEFAULT_CLIENT_ID,
-                 command_topic: str = DEFAULT_COMMAND_TOPIC):
+                 command_topic: str = DEFAULT_COMMAND_TOPIC,
+                 max_command_age_s: float | None = StaleCommandFilter.DEFAULT_MAX_AGE_S):
         super().__init__()
         self.host = host
         self.port = port
         self.client_id = client_id
         self.command_topic = command_topic
         
-        self.client = mqtt.Client(client_id=self.client_id)
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id)
+        self.client.reconnect_delay_set(min_delay=self.MIN_RECONNECT_DELAY_S, max_delay=self.MAX_RECONNECT_DELAY_S)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_connect_fail = self._on_connect_fail
         self.logger.info(f"Инициализация CommandReciever для {self.host}:{self.port}, client_id: {self.client_id}")
         self.connected = False
-        self._commands_callback_ref: Callable | None = None
+        self._connection_lost_callback: Callable | None = None
+        self.command_filter = StaleCommandFilter(max_age_s=max_command_age_s)
+        self.throttled_logger = ThrottledLogger(self.logger)
 
-    def connect(self, commands_callback: Callable) -> bool | None:
+    def connect(self, commands_callback: Callable, connection_lost_callback: Callable | None = None) -> bool:
+        """
+        Starts the MQTT network thread, which connects and reconnects in the
+        background with exponential backoff. The command topic is subscribed
+        on every (re)connect; connection_lost_callback runs on every disconnect.
+        """
         self.logger.info("Подключение к MQTT...")
+        self.client.on_message = self.commands_callback_builder(commands_callback)
+        self._connection_lost_callback = connection_lost_callback
         try:
-            self.client.connect(self.host)
-            self.client.subscribe("robot/command")
-            self.client.on_message = self.commands_callback_builder(commands_callback)
+            self.client.connect_async(self.host, self.port)
             self.client.loop_start()
-            self.connected = True
-            self.logger.success("Подключение к MQTT успешно")
             return True
         except Exception as e:
             self.logger.error(f"Ошибка при подключении к MQTT: {e}")
@@ -40,14 +54,40 @@ class CommandReciever(LoggedClass):
     
     def disconnect(self):
         self.logger.info("Отключение от MQTT...")
+        self._connection_lost_callback = None
         self.client.disconnect()
+        self.client.loop_stop()
         self.connected = False
         self.logger.success("Отключение от MQTT успешно")
 
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            self.logger.error(f"MQTT брокер отклонил подключение: {reason_code}")
+            return
+        client.subscribe(self.command_topic)
+        self.connected = True
+        self.logger.success(f"Подключение к MQTT успешно, подписка на {self.command_topic}")
+
+    def _on_connect_fail(self, client, userdata):
+        self.logger.warning(f"MQTT брокер {self.host}:{self.port} недоступен, повтор подключения...")
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.connected = False
+        if self._connection_lost_callback is not None:
+            self.logger.error(f"MQTT соединение потеряно ({reason_code}), переподключение...")
+            self._connection_lost_callback()
+
     def commands_callback_builder(self, commands_callback: Callable):
         def on_message(client, userdata, message):
-            self.logger.info(f"Получено сообщение: {message.payload.decode()}")
-            command = message.payload.decode()
-            self.logger.info(f"Команда: {command}")
-            commands_callback(command)
+            try:
+                packet = decode_command(message.payload)
+            except ValueError as e:
+                self.throttled_logger.log("ERROR", "malformed", "Некорректный пакет команды: {}", e)
+                return
+            if not self.command_filter.accept(packet, time.time()):
+                self.throttled_logger.warning("rejected", "Отброшена устаревшая команда #{}: {}",
+                                              packet.sequence, packet.command.command.value)
+                return
+            self.logger.debug("Команда #{}: {} {}", packet.sequence, packet.command.command.value, packet.command.args)
+            commands_callback(packet.command)
         return on_message
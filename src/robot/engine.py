@@ -1,8 +1,10 @@
-from common.logged import LoggedClass
-import RPi.GPIO as GPIO
+from common.logged import LoggedClass, ThrottledLogger
+from common.drive import differential_mix
+from gpio import GpioBackend, RpiGpioBackend
 import time
 import threading
 from enum import Enum
+from typing import Callable, Hashable
 
 class WheelState(Enum):
     FORWARD = "forward"
@@ -13,10 +15,108 @@ class Wheel(Enum):
     LEFT = "left"
     RIGHT = "right"
 
+# Уровни пары входов H-моста (первый, второй) для каждого состояния колеса
+WHEEL_STATE_LEVELS = {
+    WheelState.FORWARD: (1, 0),
+    WheelState.REVERSE: (0, 1),
+    WheelState.STOP: (0, 0),
+}
+
+class MotorScheduler(LoggedClass):
+    """
+    One long-lived thread that owns the deadline of the current motor action.
+    A new command either replaces the action or, if the wheels already do
+    what it asks, only moves the deadline. Pin writes of commands and the
+    auto-stop happen under the same lock, so an expired deadline can never
+    stop an action that was applied after it.
+    """
+
+    def __init__(self, on_expire: Callable[[], None]):
+        super().__init__()
+        self._on_expire = on_expire
+        self._condition = threading.Condition()
+        self._deadline: float | None = None
+        self._current_key: Hashable | None = None
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+        self.actions_applied = 0
+        self.actions_extended = 0
+        self.actions_expired = 0
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="motor-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def schedule(self, key: Hashable, action: Callable[[], None], duration: float) -> None:
+        """
+        Runs action (unless the active action has the same key) and sets the
+        deadline to duration seconds from now.
+        """
+        with self._condition:
+            if self._deadline is not None and key == self._current_key:
+                self.actions_extended += 1
+            else:
+                action()
+                self._current_key = key
+                self.actions_applied += 1
+            self._deadline = time.monotonic() + duration
+            self._condition.notify()
+
+    def cancel(self, action: Callable[[], None]) -> None:
+        """
+        Clears the deadline and runs action (normally a stop) atomically.
+        """
+        with self._condition:
+            self._deadline = None
+            self._current_key = None
+            action()
+            self._condition.notify()
+
+    def _run(self) -> None:
+        with self._condition:
+            while self._running:
+                if self._deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._deadline = None
+                self._current_key = None
+                self.actions_expired += 1
+                try:
+                    self._on_expire()
+                except Exception as e:
+                    self.logger.error(f"Ошибка авто-остановки: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "applied": self.actions_applied,
+            "extended": self.actions_extended,
+            "expired": self.actions_expired,
+        }
+
 class Engine(LoggedClass):
     DEFAULT_ACTION_DURATION_S = 0.25
+    PWM_FREQUENCY_HZ = 1000
+    # Ниже этого заполнения моторы не трогаются с места, поэтому ненулевая скорость отображается на [MIN, 100]
+    MIN_DUTY_CYCLE = 35.0
+    # Движению колеса вперёд соответствует REVERSE (так подключены моторы, см. forward())
+    WHEEL_STATE_FOR_POSITIVE_SPEED = WheelState.REVERSE
+    WHEEL_STATE_FOR_NEGATIVE_SPEED = WheelState.FORWARD
 
-    def __init__(self):
+    def __init__(self, backend: GpioBackend | None = None):
         super().__init__()
         self.logger.info("Инициализация двигателя (с авто-остановкой)")
         self.IN1 = 12
@@ -26,70 +126,78 @@ class Engine(LoggedClass):
         self.ENA = 6
         self.ENB = 26
 
-        GPIO.setmode(GPIO.BCM)
-        for pin in (self.IN1, self.IN2, self.IN3, self.IN4, self.ENA, self.ENB):
-            GPIO.setup(pin, GPIO.OUT)
-
-        GPIO.output(self.ENA, GPIO.HIGH)
-        GPIO.output(self.ENB, GPIO.HIGH)
+        self.wheel_pins = {Wheel.LEFT: (self.IN1, self.IN2), Wheel.RIGHT: (self.IN4, self.IN3)}
+        self.wheel_pwm_pins = {Wheel.LEFT: self.ENA, Wheel.RIGHT: self.ENB}
 
-        self._current_action_timer = None
+        self.backend = backend if backend is not None else RpiGpioBackend()
+        self.backend.setup_outputs([self.IN1, self.IN2, self.IN3, self.IN4], [self.ENA, self.ENB],
+                                   self.PWM_FREQUENCY_HZ)
 
-    def _cancel_previous_action_timer(self):
-        if self._current_action_timer and self._current_action_timer.is_alive():
-            self._current_action_timer.cancel()
-        self._current_action_timer = None
+        self.throttled_logger = ThrottledLogger(self.logger)
+        self.scheduler = MotorScheduler(on_expire=self._auto_stop)
+        self.scheduler.start()
 
-    def _start_action_timer(self, duration: float):
-        self._cancel_previous_action_timer()
-        self._current_action_timer = threading.Timer(duration, self._auto_stop)
-        self._current_action_timer.start()
+    def _set_wheels(self, left: float, right: float):
+        """
+        Wheel speeds in [-1, 1]: the sign selects the direction, the magnitude
+        the PWM duty cycle. All four direction pins are written in one batch.
+        """
+        speeds = {Wheel.LEFT: left, Wheel.RIGHT: right}
+        levels = {}
+        for wheel, speed in speeds.items():
+            first_pin, second_pin = self.wheel_pins[wheel]
+            levels[first_pin], levels[second_pin] = WHEEL_STATE_LEVELS[self._wheel_state(speed)]
+        self.backend.write_pins(levels)
+        for wheel, speed in speeds.items():
+            self.backend.set_pwm(self.wheel_pwm_pins[wheel], self._duty_cycle(speed))
 
     def _auto_stop(self):
-        self.logger.info(f"Авто-остановка после {self.DEFAULT_ACTION_DURATION_S} сек.")
-        self.control_wheel(Wheel.LEFT, WheelState.STOP)
-        self.control_wheel(Wheel.RIGHT, WheelState.STOP)
-        self._current_action_timer = None
-
-    def control_wheel(self, wheel: Wheel, wheel_state: WheelState):
-        pins = (self.IN1, self.IN2) if wheel == Wheel.LEFT else (self.IN4, self.IN3)
-        if wheel_state == WheelState.FORWARD:
-            GPIO.output(pins[0], GPIO.HIGH)
-            GPIO.output(pins[1], GPIO.LOW)
-        elif wheel_state == WheelState.REVERSE:
-            GPIO.output(pins[0], GPIO.LOW)
-            GPIO.output(pins[1], GPIO.HIGH)
-        else:
-            GPIO.output(pins[0], GPIO.LOW)
-            GPIO.output(pins[1], GPIO.LOW)
+        self.throttled_logger.info("auto_stop", "Авто-остановка: время действия команды истекло")
+        self._set_wheels(0.0, 0.0)
+
+    def _wheel_state(self, speed: float) -> WheelState:
+        if speed > 0:
+            return self.WHEEL_STATE_FOR_POSITIVE_SPEED
+        if speed < 0:
+            return self.WHEEL_STATE_FOR_NEGATIVE_SPEED
+        return WheelState.STOP
+
+    def _duty_cycle(self, speed: float) -> float:
+        magnitude = min(abs(speed), 1.0)
+        if magnitude == 0.0:
+            return 0.0
+        return self.MIN_DUTY_CYCLE + (100.0 - self.MIN_DUTY_CYCLE) * magnitude
+
+    def drive(self, speed: float, turn: float, duration: float = DEFAULT_ACTION_DURATION_S):
+        """
+        Differential drive: speed and turn in [-1, 1], turn > 0 turns like turn_left.
+        The motors stop after duration seconds unless a new command arrives.
+        """
+        left, right = differential_mix(speed, turn)
+        self.logger.debug("Движение: speed={:.2f}, turn={:.2f} -> L={:.2f}, R={:.2f} (на {} сек)",
+                          speed, turn, left, right, duration)
+        self.scheduler.schedule((left, right), lambda: self._set_wheels(left, right), duration)
 
     def forward(self, duration: float = DEFAULT_ACTION_DURATION_S):
-        self.logger.info(f"Начало движения вперёд (на {duration} сек)...")
-        self.control_wheel(Wheel.LEFT, WheelState.REVERSE)
-        self.control_wheel(Wheel.RIGHT, WheelState.REVERSE)
-        self._start_action_timer(duration)
+        self.logger.debug("Начало движения вперёд (на {} сек)...", duration)
+        self.drive(1.0, 0.0, duration)
     
     def stop(self):
-        self.logger.info("Команда STOP: Остановка двигателя...")
-        self._cancel_previous_action_timer()
-        self.control_wheel(Wheel.LEFT, WheelState.STOP)
-        self.control_wheel(Wheel.RIGHT, WheelState.STOP)
-        self.logger.success("Двигатель остановлен по команде STOP")
+        self.scheduler.cancel(lambda: self._set_wheels(0.0, 0.0))
+        self.logger.debug("Двигатель остановлен по команде STOP")
 
     def turn_left(self, duration: float = DEFAULT_ACTION_DURATION_S):
-        self.logger.info(f"Поворот налево (на {duration} сек)...")
-        self.control_wheel(Wheel.LEFT, WheelState.REVERSE)
-        self.control_wheel(Wheel.RIGHT, WheelState.FORWARD)
-        self._start_action_timer(duration)
+        self.logger.debug("Поворот налево (на {} сек)...", duration)
+        self.drive(0.0, 1.0, duration)
 
     def turn_right(self, duration: float = DEFAULT_ACTION_DURATION_S):
-        self.logger.info(f"Поворот направо (на {duration} сек)...")
-        self.control_wheel(Wheel.LEFT, WheelState.FORWARD)
-        self.control_wheel(Wheel.RIGHT, WheelState.REVERSE)
-        self._start_action_timer(duration)
+        self.logger.debug("Поворот направо (на {} сек)...", duration)
+        self.drive(0.0, -1.0, duration)
 
     def cleanup(self):
         self.logger.info("Очистка GPIO...")
         self.stop()
-        GPIO.cleanup()
+        self.scheduler.stop()
+        self.logger.info(f"Статистика действий моторов: {self.scheduler.get_stats()}")
+        self.backend.cleanup()
         self.logger.success("GPIO очищен.")
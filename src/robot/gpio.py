@@ -0,0 +1,152 @@
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable
+
+class GpioBackend(ABC):
+    """
+    Minimal output-only GPIO interface used by Engine. write_pins sets a
+    whole group of pins in one operation so both H-bridge channels switch
+    together; set_pwm takes a duty cycle in percent.
+    """
+
+    @abstractmethod
+    def setup_outputs(self, pins: list[int], pwm_pins: list[int], pwm_frequency_hz: int) -> None:
+        ...
+
+    @abstractmethod
+    def write_pins(self, levels: dict[int, int]) -> None:
+        ...
+
+    @abstractmethod
+    def set_pwm(self, pin: int, duty_cycle: float) -> None:
+        ...
+
+    def cleanup(self) -> None:
+        pass
+
+class RpiGpioBackend(GpioBackend):
+    """
+    RPi.GPIO: write_pins passes all pins to a single GPIO.output call.
+    """
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self._pwm = {}
+
+    def setup_outputs(self, pins: list[int], pwm_pins: list[int], pwm_frequency_hz: int) -> None:
+        self.GPIO.setmode(self.GPIO.BCM)
+        self.GPIO.setup(list(pins) + list(pwm_pins), self.GPIO.OUT, initial=self.GPIO.LOW)
+        for pin in pwm_pins:
+            self._pwm[pin] = self.GPIO.PWM(pin, pwm_frequency_hz)
+            self._pwm[pin].start(0)
+
+    def write_pins(self, levels: dict[int, int]) -> None:
+        self.GPIO.output(list(levels.keys()), list(levels.values()))
+
+    def set_pwm(self, pin: int, duty_cycle: float) -> None:
+        self._pwm[pin].ChangeDutyCycle(duty_cycle)
+
+    def cleanup(self) -> None:
+        for pwm in self._pwm.values():
+            pwm.stop()
+        self.GPIO.cleanup()
+
+class PigpioBackend(GpioBackend):
+    """
+    pigpio daemon: write_pins is a clear_bank_1 and a set_bank_1 register write.
+    Clearing first means an H-bridge input pair passes through LOW/LOW (coast)
+    and never through HIGH/HIGH.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 8888):
+        import pigpio
+        self.pigpio = pigpio
+        self.pi = pigpio.pi(host, port)
+        if not self.pi.connected:
+            raise RuntimeError(f"pigpiod is not reachable at {host}:{port}")
+        self._pins: list[int] = []
+
+    def setup_outputs(self, pins: list[int], pwm_pins: list[int], pwm_frequency_hz: int) -> None:
+        self._pins = list(pins) + list(pwm_pins)
+        for pin in self._pins:
+            self.pi.set_mode(pin, self.pigpio.OUTPUT)
+            self.pi.write(pin, 0)
+        for pin in pwm_pins:
+            self.pi.set_PWM_frequency(pin, pwm_frequency_hz)
+            self.pi.set_PWM_range(pin, 100)
+            self.pi.set_PWM_dutycycle(pin, 0)
+
+    def write_pins(self, levels: dict[int, int]) -> None:
+        set_mask = clear_mask = 0
+        for pin, level in levels.items():
+            if level:
+                set_mask |= 1 << pin
+            else:
+                clear_mask |= 1 << pin
+        if clear_mask:
+            self.pi.clear_bank_1(clear_mask)
+        if set_mask:
+            self.pi.set_bank_1(set_mask)
+
+    def set_pwm(self, pin: int, duty_cycle: float) -> None:
+        self.pi.set_PWM_dutycycle(pin, round(duty_cycle))
+
+    def cleanup(self) -> None:
+        for pin in self._pins:
+            self.pi.write(pin, 0)
+        self.pi.stop()
+
+@dataclass
+class PinTransition:
+    timestamp: float
+    pin: int
+    value: float
+
+class SimulatedGpioBackend(GpioBackend):
+    """
+    Keeps pin levels in memory and records every change with a timestamp.
+    All pins of one write_pins call share a timestamp, like a bank write.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.levels: dict[int, int] = {}
+        self.duty_cycles: dict[int, float] = {}
+        self.transitions: list[PinTransition] = []
+        self.pwm_transitions: list[PinTransition] = []
+        self.writes = 0
+
+    def setup_outputs(self, pins: list[int], pwm_pins: list[int], pwm_frequency_hz: int) -> None:
+        self.levels = {pin: 0 for pin in list(pins) + list(pwm_pins)}
+        self.duty_cycles = {pin: 0.0 for pin in pwm_pins}
+
+    def write_pins(self, levels: dict[int, int]) -> None:
+        timestamp = self.clock()
+        self.writes += 1
+        for pin, level in levels.items():
+            if self.levels.get(pin) != level:
+                self.levels[pin] = level
+                self.transitions.append(PinTransition(timestamp, pin, level))
+
+    def set_pwm(self, pin: int, duty_cycle: float) -> None:
+        if self.duty_cycles.get(pin) != duty_cycle:
+            self.duty_cycles[pin] = duty_cycle
+            self.pwm_transitions.append(PinTransition(self.clock(), pin, duty_cycle))
+
+    def clear(self) -> None:
+        self.transitions.clear()
+        self.pwm_transitions.clear()
+        self.writes = 0
+
+GPIO_BACKENDS = {
+    "rpi": RpiGpioBackend,
+    "pigpio": PigpioBackend,
+    "sim": SimulatedGpioBackend,
+}
+
+def create_backend(name: str) -> GpioBackend:
+    if name not in GPIO_BACKENDS:
+        raise ValueError(f"Unknown GPIO backend '{name}', expected one of {sorted(GPIO_BACKENDS)}")
+    return GPIO_BACKENDS[name]()
@@ -0,0 +1,79 @@
+import argparse
+import random
+import time
+from types import SimpleNamespace
+from loguru import logger
+from broker import CommandReciever
+from engine import Engine
+from gpio import SimulatedGpioBackend
+from common.command import Command, CommandWithArguments
+from common.metrics import LatencyHistogram, format_summary
+from common.protocol import encode_command
+
+def find_glitches(engine: Engine, backend: SimulatedGpioBackend) -> int:
+    """
+    Counts pin writes after which an H-bridge input pair was HIGH/HIGH.
+    Transitions of one batched write share a timestamp and are checked together.
+    """
+    glitches = 0
+    levels = {}
+    by_timestamp = {}
+    for transition in backend.transitions:
+        by_timestamp.setdefault(transition.timestamp, []).append(transition)
+    for timestamp in sorted(by_timestamp):
+        for transition in by_timestamp[timestamp]:
+            levels[transition.pin] = transition.value
+        if any(levels.get(first) and levels.get(second) for first, second in engine.wheel_pins.values()):
+            glitches += 1
+    return glitches
+
+def measure(command_count: int, seed: int):
+    rng = random.Random(seed)
+    backend = SimulatedGpioBackend()
+    engine = Engine(backend=backend)
+    receiver = CommandReciever(max_command_age_s=None)
+
+    def on_command(command: CommandWithArguments):
+        if command.command == Command.STOP:
+            engine.stop()
+        else:
+            engine.drive(command.args["speed"], command.args["turn"], command.args["duration"])
+
+    handler = receiver.commands_callback_builder(on_command)
+    histogram = LatencyHistogram()
+    unchanged = 0
+    for sequence in range(1, command_count + 1):
+        if rng.random() < 0.1:
+            command = CommandWithArguments(Command.STOP)
+        else:
+            command = CommandWithArguments(Command.DRIVE, {"speed": rng.uniform(-1, 1),
+                                                           "turn": rng.uniform(-1, 1),
+                                                           "duration": 0.3})
+        message = SimpleNamespace(payload=encode_command(command, 1, sequence, time.time()))
+        pins_before, pwm_before = len(backend.transitions), len(backend.pwm_transitions)
+
+        received_at = time.perf_counter()
+        handler(None, None, message)
+
+        changes = backend.transitions[pins_before:] + backend.pwm_transitions[pwm_before:]
+        if not changes:
+            unchanged += 1
+        else:
+            first_change = min(transition.timestamp for transition in changes)
+            histogram.record(int((first_change - received_at) * 1e9))
+
+    engine.cleanup()
+    return histogram, unchanged, find_glitches(engine, backend), backend.writes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка от получения пакета команды до переключения пинов на симулированном GPIO")
+    parser.add_argument("--commands", type=int, default=5000, help="Число случайных команд")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logger.remove()
+    histogram, unchanged, glitches, writes = measure(args.commands, args.seed)
+    print("Задержка пакет -> первое изменение пина:")
+    for line in format_summary({"command_to_pin": histogram.summary()}):
+        print(f"    {line}")
+    print(f"Пакетных записей пинов: {writes}, команд без изменения пинов: {unchanged}, сбоев H-моста: {glitches}")
@@ -1,44 +1,56 @@
-import time
 import signal
+import threading
 from engine import Engine
+from gpio import create_backend
 from broker import CommandReciever
-from common.command import Command as CommonCommand
+from watchdog import CommandWatchdog
+from common.command import Command as CommonCommand, CommandWithArguments
+from common.logged import configure_logger
+from loguru import logger
 
 # --- Конфигурация ---
 MQTT_BROKER_HOST = "192.168.1.104"
 MQTT_BROKER_PORT = 1883
 MQTT_COMMAND_TOPIC = "robot/command"
+GPIO_BACKEND = "rpi"  # "rpi" (RPi.GPIO), "pigpio" (нужен запущенный pigpiod) или "sim" (без оборудования)
+COMMAND_MAX_AGE_S = 0.5  # None - не проверять возраст команд (часы хостов не синхронизированы)
+LOG_LEVEL = "INFO"
+LOG_ENQUEUE = True  # запись логов в фоновом потоке, не задерживает обработку команд
+COMMAND_WATCHDOG_TIMEOUT_S = 1.0  # остановка моторов, если нет ни команд, ни heartbeat
 # --------------------
 
-robot_engine = Engine()
-command_receiver = CommandReciever(host=MQTT_BROKER_HOST, port=MQTT_BROKER_PORT)
+configure_logger(level=LOG_LEVEL, enqueue=LOG_ENQUEUE)
+robot_engine = Engine(backend=create_backend(GPIO_BACKEND))
+command_receiver = CommandReciever(host=MQTT_BROKER_HOST, port=MQTT_BROKER_PORT,
+                                   command_topic=MQTT_COMMAND_TOPIC,
+                                   max_command_age_s=COMMAND_MAX_AGE_S)
+command_watchdog = CommandWatchdog(timeout_s=COMMAND_WATCHDOG_TIMEOUT_S, on_timeout=robot_engine.stop)
 
-keep_running = True
+stop_requested = threading.Event()
 
 ROBOT_ACTION_DURATION = 0.25
 
 def signal_handler(sig, frame):
-    global keep_running
     robot_engine.logger.warning(f"Получен сигнал {sig}, завершение работы робота...")
-    keep_running = False
+    stop_requested.set()
 
-def mqtt_commands_callback(command_str: str):
-    robot_engine.logger.info(f"MQTT | Получена команда: '{command_str}'")
+def mqtt_commands_callback(command: CommandWithArguments):
+    command_watchdog.feed()
+    cmd_enum = command.command
+    duration = command.args.get("duration", ROBOT_ACTION_DURATION)
     try:
-        cmd_enum = CommonCommand(command_str)
-        
         if cmd_enum == CommonCommand.MOVE_FORWARD:
-            robot_engine.forward()
+            robot_engine.forward(duration)
         elif cmd_enum == CommonCommand.TURN_LEFT:
-            robot_engine.turn_left()
+            robot_engine.turn_left(duration)
         elif cmd_enum == CommonCommand.TURN_RIGHT:
-            robot_engine.turn_right()
+            robot_engine.turn_right(duration)
+        elif cmd_enum == CommonCommand.DRIVE:
+            robot_engine.drive(command.args.get("speed", 0.0), command.args.get("turn", 0.0), duration)
         elif cmd_enum == CommonCommand.STOP:
             robot_engine.stop()
-    except ValueError:
-        robot_engine.logger.error(f"MQTT | Неизвестная команда: '{command_str}'")
     except Exception as e:
-        robot_engine.logger.error(f"MQTT | Ошибка при обработке команды '{command_str}': {e}")
+        robot_engine.logger.error(f"MQTT | Ошибка при обработке команды '{cmd_enum.value}': {e}")
 
 def main():
     signal.signal(signal.SIGINT, signal_handler)
@@ -46,32 +58,32 @@ def main():
 
     robot_engine.logger.info("Запуск контроллера робота...")
 
-    if not command_receiver.connect(commands_callback=mqtt_commands_callback):
-        robot_engine.logger.critical("Не удалось подключиться к MQTT брокеру. Выход.")
+    command_watchdog.start()
+    if not command_receiver.connect(commands_callback=mqtt_commands_callback,
+                                    connection_lost_callback=robot_engine.stop):
+        robot_engine.logger.critical("Не удалось запустить MQTT клиент. Выход.")
+        command_watchdog.stop()
         robot_engine.cleanup()
         exit(1)
     
     robot_engine.logger.info(f"Робот слушает команды на MQTT {MQTT_BROKER_HOST}")
 
     try:
-        while keep_running:
-            if not command_receiver.connected:
-                robot_engine.logger.error("MQTT соединение потеряно. Попытка переподключения...")
-                if not command_receiver.connect(commands_callback=mqtt_commands_callback):
-                    robot_engine.logger.critical("Не удалось переподключиться к MQTT. Выход.")
-                    break 
-                else:
-                    robot_engine.logger.info("Успешно переподключено к MQTT.")
-            time.sleep(0.1)
+        # Переподключение и остановка моторов при потере связи идут в фоновых потоках
+        while not stop_requested.wait(timeout=1.0):
+            pass
     except Exception as e:
         robot_engine.logger.critical(f"Критическая ошибка в главном цикле робота: {e}", exc_info=True)
     finally:
         robot_engine.logger.info("Завершение работы контроллера робота...")
-        if command_receiver.connected:
-            command_receiver.disconnect()
+        command_receiver.disconnect()
+        command_watchdog.stop()
+        robot_engine.logger.info(f"Остановок по watchdog: {command_watchdog.timeouts}, "
+                                 f"фильтр команд: {command_receiver.command_filter.get_stats()}")
         robot_engine.stop()
         robot_engine.cleanup()
         robot_engine.logger.info("Контроллер робота остановлен.")
+        logger.complete()
 
 
 if __name__ == "__main__":
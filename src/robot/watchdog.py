@@ -0,0 +1,58 @@
+import threading
+import time
+from typing import Callable
+from common.logged import LoggedClass
+
+class CommandWatchdog(LoggedClass):
+    """
+    Calls on_timeout once when feed() has not been called for timeout_s.
+    It stays quiet until the next feed() re-arms it, so a dead link stops the
+    motors within timeout_s no matter how long the last command was meant to last.
+    """
+
+    def __init__(self, timeout_s: float, on_timeout: Callable[[], None]):
+        super().__init__()
+        self.timeout_s = timeout_s
+        self._on_timeout = on_timeout
+        self._condition = threading.Condition()
+        self._deadline: float | None = None
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+        self.timeouts = 0
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="command-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def feed(self) -> None:
+        with self._condition:
+            self._deadline = time.monotonic() + self.timeout_s
+            self._condition.notify()
+
+    def _run(self) -> None:
+        with self._condition:
+            while self._running:
+                if self._deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._deadline = None
+                self.timeouts += 1
+                self.logger.warning(f"Нет команд и heartbeat дольше {self.timeout_s} сек, остановка моторов")
+                try:
+                    self._on_timeout()
+                except Exception as e:
+                    self.logger.error(f"Ошибка остановки по watchdog: {e}")
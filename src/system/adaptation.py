@@ -0,0 +1,206 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from common.logged import LoggedClass
+
+
+class HsvRangeAdapter(LoggedClass):
+    """
+    Follows slow lighting changes by retuning the HSV ranges of a
+    CameraProcessor off the frame path. submit() only swaps a reference to
+    the latest frame and results; a background thread samples the pixels of
+    every detected marker at most every sample_interval_s, keeps a decaying
+    H/S/V histogram per color and every update_interval_s moves each range
+    part of the way towards the percentiles of its histogram. New ranges
+    reach the processor through set_hsv_ranges(), which takes effect from
+    the next frame.
+
+    Marker pixels are the connected region around the detected centroid that
+    fits the current range widened by margin, so the ranges can follow a
+    drift and not only shrink. Each bound stays within max_drift of the
+    processor's initial ranges, so a marker that is lost for good cannot pull
+    its range over the background. Hue ranges are assumed not to wrap around
+    0/180, as in ColorSegmenter.
+    """
+    CHANNEL_LIMITS = (179, 255, 255)
+    DEFAULT_SAMPLE_INTERVAL_S = 0.1
+    DEFAULT_UPDATE_INTERVAL_S = 1.0
+    DEFAULT_HISTOGRAM_DECAY = 0.05
+    DEFAULT_PERCENTILES = (0.02, 0.98)
+    DEFAULT_MARGIN = (4, 20, 20)
+    DEFAULT_ADAPTATION_RATE = 0.25
+    DEFAULT_MAX_STEP = (2, 8, 8)
+    DEFAULT_MAX_DRIFT = (10, 60, 120)
+    MIN_SAMPLE_PIXELS = 20
+    PATCH_HALF_SIZE_PX = 32
+
+    def __init__(self,
+                 processor,
+                 sample_interval_s: float = DEFAULT_SAMPLE_INTERVAL_S,
+                 update_interval_s: float = DEFAULT_UPDATE_INTERVAL_S,
+                 histogram_decay: float = DEFAULT_HISTOGRAM_DECAY,
+                 percentiles: tuple[float, float] = DEFAULT_PERCENTILES,
+                 margin: tuple[int, int, int] = DEFAULT_MARGIN,
+                 adaptation_rate: float = DEFAULT_ADAPTATION_RATE,
+                 max_step: tuple[int, int, int] = DEFAULT_MAX_STEP,
+                 max_drift: tuple[int, int, int] = DEFAULT_MAX_DRIFT):
+        super().__init__()
+        self.processor = processor
+        self.sample_interval_s = sample_interval_s
+        self.update_interval_s = update_interval_s
+        self.histogram_decay = histogram_decay
+        self.percentiles = percentiles
+        self.margin = np.array(margin)
+        self.adaptation_rate = adaptation_rate
+        self.max_step = np.array(max_step)
+        self.max_drift = np.array(max_drift)
+
+        self.colors = tuple(processor.marker_colors)
+        self._initial_ranges = {color: np.array(processor.get_current_hsv_ranges()[color], dtype=int)
+                                for color in self.colors}
+        self._ranges = {color: values.copy() for color, values in self._initial_ranges.items()}
+        self._histograms: dict[str, list[np.ndarray]] = {}
+
+        self._pending: tuple[np.ndarray, dict] | None = None
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+        self.frames_sampled = 0
+        self.frames_skipped = 0
+        self.updates = 0
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._adapt_loop, name="hsv-adapter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.logger.info(f"HSV adapter stopped: sampled {self.frames_sampled} frames, "
+                         f"skipped {self.frames_skipped}, range updates {self.updates}")
+
+    def submit(self, frame: np.ndarray, results: dict) -> None:
+        with self._condition:
+            if self._pending is not None:
+                self.frames_skipped += 1
+            self._pending = (frame, results)
+            self._condition.notify()
+
+    def get_stats(self) -> dict:
+        return {
+            "sampled": self.frames_sampled,
+            "skipped": self.frames_skipped,
+            "updates": self.updates,
+            "ranges": {color: values.tolist() for color, values in self._ranges.items()},
+        }
+
+    def _adapt_loop(self) -> None:
+        next_update = time.monotonic() + self.update_interval_s
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: not self._running or self._pending is not None)
+                if not self._running:
+                    return
+                frame, results = self._pending
+                self._pending = None
+            try:
+                self._sample_frame(frame, results)
+                self.frames_sampled += 1
+                if time.monotonic() >= next_update:
+                    next_update = time.monotonic() + self.update_interval_s
+                    self._update_ranges()
+            except Exception as e:
+                self.logger.error(f"HSV adaptation failed: {e}")
+            time.sleep(self.sample_interval_s)
+
+    def _marker_pixels(self, frame: np.ndarray, centroid: tuple[int, int], scale_ratio: float, color: str):
+        """
+        Returns the (N, 3) HSV pixels of the marker around a centroid given in
+        processing-frame coordinates, sampled at the processing resolution.
+        """
+        half_size = int(self.PATCH_HALF_SIZE_PX / scale_ratio)
+        center_x, center_y = int(centroid[0] / scale_ratio), int(centroid[1] / scale_ratio)
+        x0, y0 = max(center_x - half_size, 0), max(center_y - half_size, 0)
+        x1, y1 = min(center_x + half_size, frame.shape[1]), min(center_y + half_size, frame.shape[0])
+        if x1 <= x0 or y1 <= y0:
+            return None
+        patch = frame[y0:y1, x0:x1]
+        if scale_ratio != 1.0:
+            size = (max(int((x1 - x0) * scale_ratio), 1), max(int((y1 - y0) * scale_ratio), 1))
+            patch = cv2.resize(patch, size, interpolation=cv2.INTER_AREA)
+        hsv_patch = cv2.cvtColor(patch, cv2.COLOR_BGR2HSV)
+
+        values = self._ranges[color]
+        limits = np.array(self.CHANNEL_LIMITS)
+        lower = np.clip(values[:3] - self.margin, 0, limits)
+        upper = np.clip(values[3:] + self.margin, 0, limits)
+        mask = cv2.inRange(hsv_patch, lower.astype(np.uint8), upper.astype(np.uint8))
+        _, components = cv2.connectedComponents(mask)
+
+        seed_x = min(int((center_x - x0) * scale_ratio), components.shape[1] - 1)
+        seed_y = min(int((center_y - y0) * scale_ratio), components.shape[0] - 1)
+        component = components[seed_y, seed_x]
+        if component == 0:
+            return None
+        pixels = hsv_patch[components == component]
+        return pixels if len(pixels) >= self.MIN_SAMPLE_PIXELS else None
+
+    def _sample_frame(self, frame: np.ndarray, results: dict) -> None:
+        scale_ratio = results.get("scale_ratio", 1.0)
+        for color, centroid in results.get("marker_centers_uv", {}).items():
+            if centroid is None or color not in self._ranges:
+                continue
+            pixels = self._marker_pixels(frame, centroid, scale_ratio, color)
+            if pixels is None:
+                continue
+            frame_histograms = [np.bincount(pixels[:, channel], minlength=limit + 1) / len(pixels)
+                                for channel, limit in enumerate(self.CHANNEL_LIMITS)]
+            histograms = self._histograms.get(color)
+            if histograms is None:
+                self._histograms[color] = frame_histograms
+            else:
+                decay = self.histogram_decay
+                self._histograms[color] = [(1 - decay) * old + decay * new
+                                           for old, new in zip(histograms, frame_histograms)]
+
+    def _update_ranges(self) -> None:
+        changed = False
+        limits = np.array(self.CHANNEL_LIMITS)
+        for color, histograms in self._histograms.items():
+            target_lower = np.empty(3, dtype=int)
+            target_upper = np.empty(3, dtype=int)
+            for channel, histogram in enumerate(histograms):
+                cdf = np.cumsum(histogram)
+                cdf /= cdf[-1]
+                target_lower[channel] = np.searchsorted(cdf, self.percentiles[0])
+                target_upper[channel] = np.searchsorted(cdf, self.percentiles[1])
+            target = np.concatenate([np.clip(target_lower - self.margin, 0, limits),
+                                     np.clip(target_upper + self.margin, 0, limits)])
+
+            current = self._ranges[color]
+            difference = target - current
+            step = np.rint(difference * self.adaptation_rate).astype(int)
+            step = np.where((step == 0) & (difference != 0), np.sign(difference), step)
+            step = np.clip(step, -np.tile(self.max_step, 2), np.tile(self.max_step, 2))
+            initial = self._initial_ranges[color]
+            drift = np.tile(self.max_drift, 2)
+            updated = np.clip(current + step, initial - drift, initial + drift)
+            updated = np.clip(updated, 0, np.tile(limits, 2))
+            updated[3:] = np.maximum(updated[3:], updated[:3])
+            if not np.array_equal(updated, current):
+                self._ranges[color] = updated
+                changed = True
+
+        if changed:
+            self.updates += 1
+            self.processor.set_hsv_ranges({color: values.tolist() for color, values in self._ranges.items()})
+            self.logger.debug("HSV ranges adapted: {}", self.get_stats()["ranges"])
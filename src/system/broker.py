@@ -1,24 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
 import paho.mqtt.client as mqtt
 from common.logged import LoggedClass
-from common.command import Command
+from common.command import Command, CommandWithArguments
+from common.metrics import LatencyHistogram
+from common.protocol import encode_command, decode_command, new_session_id, StaleCommandFilter
 
 class CommandSender(LoggedClass):
+    """
+    MQTT command publisher that never blocks the caller. connect() only starts
+    the paho network thread, which (re)connects in the background with
+    exponential backoff between min_reconnect_delay_s and max_reconnect_delay_s.
+    While offline, send() keeps only the latest command per topic in a small
+    outbox (at most outbox_size topics) and publishes it once the connection
+    is back. Motion commands keep the time they were queued, so the robot's
+    stale filter still applies, and ones older than outbox_max_age_s are
+    dropped on reconnect, since the robot may run with the age check
+    disabled. STOP is always replayed, with a fresh timestamp; heartbeats are
+    not kept. Time from
+    send() to on_publish is recorded in publish_latency.
+    """
     COMMAND_TOPIC = "robot/command"
+    ROBOT_COMMAND_TOPIC_TEMPLATE = "robot/{name}/command"
+    DEFAULT_OUTBOX_SIZE = 4
 
-    def __init__(self, host: str = "localhost", port: int = 1883, client_id_pub: str = "robot_pub"):
+    def __init__(self,
+                 host: str = "localhost",
+                 port: int = 1883,
+                 client_id_pub: str = "robot_pub",
+                 outbox_size: int = DEFAULT_OUTBOX_SIZE,
+                 outbox_max_age_s: float = StaleCommandFilter.DEFAULT_MAX_AGE_S,
+                 min_reconnect_delay_s: int = 1,
+                 max_reconnect_delay_s: int = 16):
         super().__init__()
-        self.pub_client = mqtt.Client(client_id=client_id_pub)
+        self.pub_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id_pub)
+        self.pub_client.reconnect_delay_set(min_delay=min_reconnect_delay_s, max_delay=max_reconnect_delay_s)
+        self.pub_client.on_connect = self._on_connect
+        self.pub_client.on_disconnect = self._on_disconnect
+        self.pub_client.on_connect_fail = self._on_connect_fail
+        self.pub_client.on_publish = self._on_publish
         self.host = host
         self.port = port
         self.connected = False
+        self.session = new_session_id()
+        self._sequence = 0
+        self._started = False
+
+        self.outbox_size = outbox_size
+        self.outbox_max_age_s = outbox_max_age_s
+        self._outbox: OrderedDict[str, tuple[CommandWithArguments, float]] = OrderedDict()
+        self._in_flight: dict[int, int] = {}
+        self._published_early: dict[int, int] = {}
+        self._lock = threading.RLock()
+
+        self.publish_latency = LatencyHistogram()
+        self.commands_published = 0
+        self.commands_queued_offline = 0
+        self.commands_dropped_offline = 0
+        self.commands_expired_offline = 0
+        self.connects = 0
+        self.disconnects = 0
 
     def connect(self) -> bool:
+        """
+        Starts connecting in the background; returns False only if the network
+        thread could not be started.
+        """
         try:
-            self.pub_client.connect(self.host, self.port)
+            self.pub_client.connect_async(self.host, self.port)
             self.pub_client.loop_start()
-
-            self.connected = True
-            self.logger.success(f"MQTT connected: {self.host}:{self.port}")
+            self._started = True
+            self.logger.info(f"MQTT connecting in background: {self.host}:{self.port}")
             return True
         except Exception as e:
             self.logger.error(f"MQTT connection error: {e}")
@@ -26,36 +80,132 @@ class CommandSender(LoggedClass):
 
     def disconnect(self) -> None:
         """
-        Stop loops and disconnect both clients.
+        Disconnect and stop the network thread.
         """
-        if self.connected:
-            self.pub_client.loop_stop()
+        if self._started:
             self.pub_client.disconnect()
+            self.pub_client.loop_stop()
+            self._started = False
             self.connected = False
             self.logger.success("MQTT disconnected")
 
-    def send(self, command: Command) -> bool:
-        if not self.connected:
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            self.logger.error(f"MQTT connection refused: {reason_code}")
+            return
+        self.connects += 1
+        self.logger.success(f"MQTT connected: {self.host}:{self.port}")
+        with self._lock:
+            self.connected = True
+            pending = list(self._outbox.items())
+            self._outbox.clear()
+        now = time.time()
+        for topic, (command, queued_at) in pending:
+            if command.command == Command.STOP:
+                self._publish(command, topic)
+            elif now - queued_at <= self.outbox_max_age_s:
+                self._publish(command, topic, queued_at)
+            else:
+                self.commands_expired_offline += 1
+                self.logger.info(f"Dropped {command.command.value} queued {now - queued_at:.1f}s ago for {topic}")
+
+    def _on_connect_fail(self, client, userdata):
+        self.logger.warning(f"MQTT broker {self.host}:{self.port} unreachable, retrying in background")
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        with self._lock:
+            self.connected = False
+            self._in_flight.clear()
+            self._published_early.clear()
+        if self._started:
+            self.disconnects += 1
+            self.logger.warning(f"MQTT connection lost ({reason_code}), reconnecting in background")
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        published_ns = time.perf_counter_ns()
+        with self._lock:
+            enqueued_ns = self._in_flight.pop(mid, None)
+            if enqueued_ns is None:
+                # on_publish may run inside publish() before its mid is known
+                self._published_early[mid] = published_ns
+                return
+        self.publish_latency.record(published_ns - enqueued_ns)
+
+    @classmethod
+    def robot_topic(cls, robot_name: str) -> str:
+        return cls.ROBOT_COMMAND_TOPIC_TEMPLATE.format(name=robot_name)
+
+    def _publish(self, command: CommandWithArguments, topic: str, timestamp: float | None = None) -> bool:
+        with self._lock:
+            enqueued_ns = time.perf_counter_ns()
+            self._sequence += 1
+            payload = encode_command(command, self.session, self._sequence,
+                                     timestamp if timestamp is not None else time.time())
+            result = self.pub_client.publish(topic, payload)
+            if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                self.logger.error(f"Failed to send: {command.command.value} ({mqtt.error_string(result.rc)})")
+                return False
+            published_ns = self._published_early.pop(result.mid, None)
+            if published_ns is None:
+                self._in_flight[result.mid] = enqueued_ns
+        if published_ns is not None:
+            self.publish_latency.record(published_ns - enqueued_ns)
+        self.commands_published += 1
+        self.logger.debug("Sent command #{}: {} {}", self._sequence, command.command.value, command.args)
+        return True
+
+    def send(self,
+             command: Command | CommandWithArguments,
+             topic: str | None = None,
+             on_result: Callable[[bool], None] | None = None) -> bool:
+        """
+        Publishes the command, or keeps it in the outbox while offline.
+        Returns True only if it was handed to the network thread; the same
+        result is passed to on_result.
+        """
+        ok = self._send(command, topic)
+        if on_result is not None:
+            on_result(ok)
+        return ok
+
+    def _send(self, command: Command | CommandWithArguments, topic: str | None) -> bool:
+        if not self._started:
             self.logger.warning("Send called before MQTT connect")
             return False
-        payload = command.value
-        result = self.pub_client.publish(self.COMMAND_TOPIC, payload)
-        print(result)
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
-            self.logger.info(f"Sent command: {payload}")
-            return True
-        else:
-            self.logger.error(f"Failed to send: {payload}")
-            return False
+        if isinstance(command, Command):
+            command = CommandWithArguments(command=command)
+        topic = topic or self.COMMAND_TOPIC
+
+        with self._lock:
+            if not self.connected:
+                if command.command == Command.HEARTBEAT:
+                    return False
+                self._outbox.pop(topic, None)
+                self._outbox[topic] = (command, time.time())
+                self.commands_queued_offline += 1
+                if len(self._outbox) > self.outbox_size:
+                    self._outbox.popitem(last=False)
+                    self.commands_dropped_offline += 1
+                return False
+        return self._publish(command, topic)
+
+    def get_stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "published": self.commands_published,
+            "queued_offline": self.commands_queued_offline,
+            "dropped_offline": self.commands_dropped_offline,
+            "expired_offline": self.commands_expired_offline,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+        }
 
     def _make_handler(self, callback):
         def handler(client, userdata, msg):
-            raw = msg.payload.decode()
-            self.logger.info(f"Received raw: {raw}")
             try:
-                cmd = Command(raw)
-                self.logger.info(f"Parsed command: {cmd}")
-                callback(cmd)
-            except ValueError:
-                self.logger.warning(f"Unknown command: {raw}")
+                packet = decode_command(msg.payload)
+                self.logger.info(f"Parsed command #{packet.sequence}: {packet.command}")
+                callback(packet.command)
+            except ValueError as e:
+                self.logger.warning(f"Malformed command packet: {e}")
         return handler
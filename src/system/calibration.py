@@ -0,0 +1,89 @@
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class CameraCalibration:
+    """
+    Lens intrinsics plus a homography from undistorted image pixels to the
+    floor plane in centimeters, both for frames of image_size (width, height).
+
+    Only the few marker centroids of a frame are undistorted and projected,
+    so floor geometry costs two small OpenCV calls per frame. The floor axes
+    must keep the image handedness (x to the right, y towards the bottom of
+    the image), otherwise left and right turns swap in compute_target_geometry.
+
+    Stored as .npz with the keys camera_matrix, dist_coeffs, image_size and
+    floor_homography.
+    """
+    camera_matrix: np.ndarray
+    dist_coeffs: np.ndarray
+    image_size: tuple[int, int]
+    floor_homography: np.ndarray
+    _undistort_maps: tuple[np.ndarray, np.ndarray] | None = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def load(cls, path: str) -> "CameraCalibration":
+        with np.load(path) as data:
+            return cls(camera_matrix=np.asarray(data["camera_matrix"], dtype=np.float64).reshape(3, 3),
+                       dist_coeffs=np.asarray(data["dist_coeffs"], dtype=np.float64).ravel(),
+                       image_size=tuple(int(v) for v in data["image_size"]),
+                       floor_homography=np.asarray(data["floor_homography"], dtype=np.float64).reshape(3, 3))
+
+    def save(self, path: str) -> None:
+        np.savez(path,
+                 camera_matrix=self.camera_matrix,
+                 dist_coeffs=self.dist_coeffs,
+                 image_size=np.asarray(self.image_size),
+                 floor_homography=self.floor_homography)
+
+    @classmethod
+    def from_floor_points(cls, camera_matrix, dist_coeffs, image_size, image_points, floor_points_cm) -> "CameraCalibration":
+        """
+        Fits the floor homography to at least four image points (pixels of a
+        raw image_size frame) with known floor positions in centimeters.
+        """
+        camera_matrix = np.asarray(camera_matrix, dtype=np.float64).reshape(3, 3)
+        dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).ravel()
+        image_points = np.asarray(image_points, dtype=np.float64).reshape(-1, 1, 2)
+        floor_points = np.asarray(floor_points_cm, dtype=np.float64).reshape(-1, 1, 2)
+        if len(image_points) < 4 or len(image_points) != len(floor_points):
+            raise ValueError("Floor homography needs at least four matching image and floor points")
+
+        undistorted = cv2.undistortPoints(image_points, camera_matrix, dist_coeffs, P=camera_matrix)
+        homography, _ = cv2.findHomography(undistorted, floor_points)
+        if homography is None:
+            raise ValueError("Floor points are degenerate, homography could not be fitted")
+        return cls(camera_matrix=camera_matrix,
+                   dist_coeffs=dist_coeffs,
+                   image_size=(int(image_size[0]), int(image_size[1])),
+                   floor_homography=homography)
+
+    def pixels_to_floor(self, points_uv, frame_width: int) -> np.ndarray:
+        """
+        Maps (N, 2) pixel points of a frame frame_width wide (e.g. the
+        downscaled processing frame) to (N, 2) floor points in centimeters.
+        """
+        points = np.asarray(points_uv, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return np.empty((0, 2))
+        points = points * (self.image_size[0] / frame_width)
+        undistorted = cv2.undistortPoints(points, self.camera_matrix, self.dist_coeffs, P=self.camera_matrix)
+        return cv2.perspectiveTransform(undistorted, self.floor_homography).reshape(-1, 2)
+
+    def undistort_image(self, img: np.ndarray) -> np.ndarray:
+        """
+        Undistorts a whole image_size frame with remap tables built on first
+        use. Meant for debug views and checking the calibration, the
+        processing path only maps centroids.
+        """
+        if (img.shape[1], img.shape[0]) != tuple(self.image_size):
+            raise ValueError(f"Frame size {img.shape[1]}x{img.shape[0]} does not match calibration {self.image_size}")
+        if self._undistort_maps is None:
+            self._undistort_maps = cv2.initUndistortRectifyMap(self.camera_matrix, self.dist_coeffs, None,
+                                                               self.camera_matrix, tuple(self.image_size),
+                                                               cv2.CV_16SC2)
+        map1, map2 = self._undistort_maps
+        return cv2.remap(img, map1, map2, interpolation=cv2.INTER_LINEAR)
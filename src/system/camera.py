@@ -1,6 +1,43 @@
 import cv2
 import numpy as np
 import math
+import time
+from dataclasses import dataclass
+from common.metrics import StageProfiler
+from system.calibration import CameraCalibration
+from system.gating import MotionGate
+from system.resolution import ResolutionController
+from system.segmentation import ColorSegmenter
+
+def compute_target_geometry(robot_center, robot_heading_rad, target_center):
+    """
+    Returns (distance, angle_to_target_deg) in the units of the points, image
+    pixels or floor centimeters. The angle is relative to the robot heading
+    when it is known, otherwise it is the bearing in the points' frame.
+    """
+    target_dx = target_center[0] - robot_center[0]
+    target_dy = target_center[1] - robot_center[1]
+    distance_to_target = math.hypot(target_dx, target_dy)
+    world_angle_to_target_rad = math.atan2(-target_dy, target_dx)
+
+    if robot_heading_rad is not None:
+        steer_angle_rad = world_angle_to_target_rad - robot_heading_rad
+        steer_angle_rad = (steer_angle_rad + math.pi) % (2 * math.pi) - math.pi
+        return distance_to_target, math.degrees(steer_angle_rad)
+    return distance_to_target, math.degrees(world_angle_to_target_rad)
+
+@dataclass(frozen=True)
+class RobotMarkers:
+    name: str
+    front_color: str
+    back_color: str
+    target_color: str
+
+@dataclass
+class MarkerTrack:
+    centroid: tuple[int, int]
+    velocity: tuple[float, float]
+    radius: int
 
 class CameraProcessor:
     DEFAULT_HSV_RANGES = {
@@ -9,28 +46,81 @@ class CameraProcessor:
         "blue": [95, 80, 80, 128, 255, 255],
     }
 
-    OUTPUT_WINDOW_NAME = "Camera Debug Output"
-
     KERNEL_MORPH_OPEN = np.ones((5, 5), np.uint8)
     KERNEL_MORPH_CLOSE_5x5 = np.ones((5, 5), np.uint8)
     KERNEL_MORPH_CLOSE_7x7 = np.ones((7, 7), np.uint8)
 
-    def __init__(self, process_frame_width=640, debug=False, initial_hsv_ranges=None):
+    DEFAULT_ROBOTS = (RobotMarkers(name="robot", front_color="pink", back_color="blue", target_color="green"),)
+    MARKER_MIN_AREA = 50
+    TARGET_MIN_AREA = 100
+
+    DETECTION_PATH_FULL = "full"
+    DETECTION_PATH_ROI = "roi"
+    ROI_MIN_HALF_SIZE_PX = 24
+    ROI_RADIUS_FACTOR = 2.0
+    ROI_MOTION_FACTOR = 3.0
+    TRACK_VELOCITY_SMOOTHING = 0.5
+
+    BLOB_METHOD_CONTOURS = "contours"
+    BLOB_METHOD_COMPONENTS = "components"
+
+    REFINE_HALF_SIZE_PX = 24
+
+    def __init__(self, process_frame_width=640, debug=False, initial_hsv_ranges=None, tracking=False,
+                 profile=False, robots=None, calibration: CameraCalibration | None = None,
+                 blob_method=BLOB_METHOD_CONTOURS, resolution_controller: ResolutionController | None = None,
+                 pyramid_refine=False, motion_gate: MotionGate | None = None):
         self.process_frame_width = process_frame_width
+        # the controller overrides process_frame_width from frame to frame to hold its fps budget;
+        # results are still reported at its largest width, so their pixel scale never changes
+        self.resolution_controller = resolution_controller
+        # pyramid_refine: markers found at the processing width are re-located at full resolution
+        # in small windows around them, and the results are reported in full-resolution pixels
+        self.pyramid_refine = pyramid_refine
+        # motion_gate: unchanged frames return the last results with "cached": True
+        self.motion_gate = motion_gate
+        self._last_results = None
+        self.calibration = calibration
         self.debug_mode = debug
+        self.profiler = StageProfiler(enabled=profile)
+        self.tracking_enabled = tracking
+        # "components" labels the mask in one connectedComponentsWithStats pass: a flat cost
+        # per mask that beats findContours only on noisy masks with many blobs
+        if blob_method == self.BLOB_METHOD_CONTOURS:
+            self._find_blob = self._find_largest_contour_and_centroid
+        elif blob_method == self.BLOB_METHOD_COMPONENTS:
+            self._find_blob = self._find_largest_component_and_centroid
+        else:
+            raise ValueError(f"Unknown blob method: {blob_method}")
+        self.blob_method = blob_method
+        self._tracks: dict[str, MarkerTrack] = {}
+        self._tracked_frame_shape = None
         
         if initial_hsv_ranges is None:
             self.hsv_ranges = {k: list(v) for k, v in self.DEFAULT_HSV_RANGES.items()}
         else:
             self.hsv_ranges = {k: list(v) for k, v in initial_hsv_ranges.items()}
 
-        if self.debug_mode:
-            self._setup_debug_windows()
+        self.robots = tuple(robots) if robots else self.DEFAULT_ROBOTS
+        self._configure_marker_colors()
+        self.segmenter = ColorSegmenter(self.hsv_ranges)
+
+    def _configure_marker_colors(self):
+        self.marker_min_areas = {}
+        self.marker_close_kernels = {}
+        for robot in self.robots:
+            for color in (robot.front_color, robot.back_color):
+                self.marker_min_areas[color] = self.MARKER_MIN_AREA
+                self.marker_close_kernels[color] = self.KERNEL_MORPH_CLOSE_5x5
+        for robot in self.robots:
+            if robot.target_color not in self.marker_min_areas:
+                self.marker_min_areas[robot.target_color] = self.TARGET_MIN_AREA
+                self.marker_close_kernels[robot.target_color] = self.KERNEL_MORPH_CLOSE_7x7
 
-    def _setup_debug_windows(self):
-        cv2.startWindowThread()
-        cv2.namedWindow(self.OUTPUT_WINDOW_NAME, cv2.WINDOW_NORMAL)
-        cv2.resizeWindow(self.OUTPUT_WINDOW_NAME, 960, 720)
+        missing = [color for color in self.marker_min_areas if color not in self.hsv_ranges]
+        if missing:
+            raise ValueError(f"No HSV ranges for marker colors: {missing}")
+        self.marker_colors = tuple(self.marker_min_areas)
 
     def _find_largest_contour_and_centroid(self, mask, min_area=30):
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -54,127 +144,288 @@ class CameraProcessor:
         
         cx = int(M["m10"] / M["m00"])
         cy = int(M["m01"] / M["m00"])
-        return (cx, cy), largest_contour
+        return (cx, cy), cv2.boundingRect(largest_contour)
 
-    def get_processing_results(self, original_img, base_min_area_scale_factor=1.0):
-        scale_ratio = 1.0
-        if self.process_frame_width and original_img.shape[1] > self.process_frame_width:
-            scale_ratio = self.process_frame_width / original_img.shape[1]
-            height = int(original_img.shape[0] * scale_ratio)
-            processed_img = cv2.resize(original_img, (self.process_frame_width, height), interpolation=cv2.INTER_AREA)
+    def _find_largest_component_and_centroid(self, mask, min_area=30):
+        count, _, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(mask, 8, cv2.CV_32S, cv2.CCL_GRANA)
+        if count <= 1:
+            return None, None
+
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        largest = int(np.argmax(areas))
+        if areas[largest] <= min_area:
+            return None, None
+
+        cx, cy = centroids[largest + 1]
+        x, y, width, height = stats[largest + 1, :4]
+        return (int(cx), int(cy)), (int(x), int(y), int(width), int(height))
+
+    def _roi_bounds(self, track, frame_shape):
+        speed = math.hypot(track.velocity[0], track.velocity[1])
+        half_size = int(max(self.ROI_MIN_HALF_SIZE_PX, track.radius * self.ROI_RADIUS_FACTOR)
+                        + speed * self.ROI_MOTION_FACTOR)
+        center_x = int(track.centroid[0] + track.velocity[0])
+        center_y = int(track.centroid[1] + track.velocity[1])
+        x0 = max(center_x - half_size, 0)
+        y0 = max(center_y - half_size, 0)
+        x1 = min(center_x + half_size, frame_shape[1])
+        y1 = min(center_y + half_size, frame_shape[0])
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def find_marker(self, labels, color, min_area, profiler: StageProfiler | None = None):
+        """
+        Centroid and bbox of the largest blob of a color in a label image.
+        Stages are timed on profiler (self.profiler by default); callers on
+        other threads pass their own.
+        """
+        profiler = profiler or self.profiler
+        mask = self.segmenter.mask(labels, color)
+        profiler.lap("mask")
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.KERNEL_MORPH_OPEN)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.marker_close_kernels[color])
+        profiler.lap("morphology")
+        centroid, bbox = self._find_blob(mask, min_area=min_area)
+        profiler.lap("contours")
+        return centroid, bbox
+
+    def _label_image(self, img):
+        hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        self.profiler.lap("convert")
+        labels = self.segmenter.label(hsv_img)
+        self.profiler.lap("segment")
+        return labels
+
+    def _update_track(self, color, centroid, bbox):
+        if centroid is None:
+            self._tracks.pop(color, None)
+            return
+        _, _, width, height = bbox
+        radius = max(width, height) // 2
+        previous = self._tracks.get(color)
+        if previous is None:
+            velocity = (0.0, 0.0)
         else:
-            processed_img = original_img.copy()
+            alpha = self.TRACK_VELOCITY_SMOOTHING
+            velocity = (alpha * (centroid[0] - previous.centroid[0]) + (1 - alpha) * previous.velocity[0],
+                        alpha * (centroid[1] - previous.centroid[1]) + (1 - alpha) * previous.velocity[1])
+        self._tracks[color] = MarkerTrack(centroid=centroid, velocity=velocity, radius=radius)
 
-        current_min_area_scale = (scale_ratio ** 2) * base_min_area_scale_factor
-        
-        output_img = processed_img.copy() if self.debug_mode else None
-        hsv_img = cv2.cvtColor(processed_img, cv2.COLOR_BGR2HSV)
+    def _detect_markers(self, processed_img, min_area_scale):
+        if processed_img.shape != self._tracked_frame_shape:
+            self._tracks.clear()
+            self._tracked_frame_shape = processed_img.shape
+
+        self.segmenter.compile(self.hsv_ranges)
+        full_labels = None
+        centroids = {}
+        detection_path = {}
 
-        current_hsv_cv = {}
-        for color, values in self.hsv_ranges.items():
-            current_hsv_cv[color] = (np.array(values[0:3]), np.array(values[3:6]))
+        for color in self.marker_colors:
+            min_area = int(self.marker_min_areas[color] * min_area_scale)
+            centroid, bbox = None, None
 
-        min_area_pink_blue = int(50 * current_min_area_scale)
-        min_area_green = int(100 * current_min_area_scale)
+            track = self._tracks.get(color) if self.tracking_enabled else None
+            roi = self._roi_bounds(track, processed_img.shape) if track is not None else None
+            if roi is not None:
+                x0, y0, x1, y1 = roi
+                roi_labels = self._label_image(processed_img[y0:y1, x0:x1])
+                centroid, bbox = self.find_marker(roi_labels, color, min_area)
+                if centroid is not None:
+                    centroid = (centroid[0] + x0, centroid[1] + y0)
+                    detection_path[color] = self.DETECTION_PATH_ROI
 
-        lower_pink, upper_pink = current_hsv_cv["pink"]
-        mask_pink = cv2.inRange(hsv_img, lower_pink, upper_pink)
-        mask_pink = cv2.morphologyEx(mask_pink, cv2.MORPH_OPEN, self.KERNEL_MORPH_OPEN)
-        mask_pink = cv2.morphologyEx(mask_pink, cv2.MORPH_CLOSE, self.KERNEL_MORPH_CLOSE_5x5)
-        centroid_pink, _ = self._find_largest_contour_and_centroid(mask_pink, min_area=min_area_pink_blue)
+            if centroid is None:
+                if full_labels is None:
+                    full_labels = self._label_image(processed_img)
+                centroid, bbox = self.find_marker(full_labels, color, min_area)
+                detection_path[color] = self.DETECTION_PATH_FULL
+
+            if self.tracking_enabled:
+                self._update_track(color, centroid, bbox)
+                self.profiler.lap("tracking")
+            centroids[color] = centroid
+
+        return centroids, detection_path
+
+    def _refine_markers(self, original_img, centroids, scale_ratio, base_min_area_scale_factor):
+        """
+        Maps coarse centroids to full resolution, re-detecting each marker in a
+        window around it. Markers not found again keep their scaled-up coarse
+        centroid.
+        """
+        half_size = int(self.REFINE_HALF_SIZE_PX / scale_ratio)
+        refined = {}
+        for color, centroid in centroids.items():
+            if centroid is None:
+                refined[color] = None
+                continue
+            center_x, center_y = int(centroid[0] / scale_ratio), int(centroid[1] / scale_ratio)
+            x0, y0 = max(center_x - half_size, 0), max(center_y - half_size, 0)
+            x1 = min(center_x + half_size, original_img.shape[1])
+            y1 = min(center_y + half_size, original_img.shape[0])
+            window_labels = self._label_image(original_img[y0:y1, x0:x1])
+            min_area = int(self.marker_min_areas[color] * base_min_area_scale_factor)
+            window_centroid, _ = self.find_marker(window_labels, color, min_area)
+            if window_centroid is not None:
+                refined[color] = (window_centroid[0] + x0, window_centroid[1] + y0)
+            else:
+                refined[color] = (center_x, center_y)
+        self.profiler.lap("refine")
+        return refined
 
-        lower_blue, upper_blue = current_hsv_cv["blue"]
-        mask_blue = cv2.inRange(hsv_img, lower_blue, upper_blue)
-        mask_blue = cv2.morphologyEx(mask_blue, cv2.MORPH_OPEN, self.KERNEL_MORPH_OPEN)
-        mask_blue = cv2.morphologyEx(mask_blue, cv2.MORPH_CLOSE, self.KERNEL_MORPH_CLOSE_5x5)
-        centroid_blue, _ = self._find_largest_contour_and_centroid(mask_blue, min_area=min_area_pink_blue)
+    @staticmethod
+    def _rescale_centroids(centroids, factor):
+        return {color: (int(round(centroid[0] * factor)), int(round(centroid[1] * factor)))
+                if centroid is not None else None
+                for color, centroid in centroids.items()}
+
+    def _compute_robot_pose(self, robot, centroids):
+        centroid_front = centroids[robot.front_color]
+        centroid_back = centroids[robot.back_color]
+        centroid_target = centroids[robot.target_color]
 
         robot_center = None
         robot_heading_rad = None
         distance_to_target = None
         angle_to_target_deg = None
 
-        if centroid_pink and self.debug_mode and output_img is not None:
-            cv2.circle(output_img, centroid_pink, 5, (203, 192, 255), -1)
-        if centroid_blue and self.debug_mode and output_img is not None:
-            cv2.circle(output_img, centroid_blue, 5, (255, 192, 203), -1)
-
-        if centroid_pink and centroid_blue:
-            if self.debug_mode and output_img is not None:
-                cv2.line(output_img, centroid_pink, centroid_blue, (255, 0, 255), 2)
-            
-            robot_center_x = (centroid_pink[0] + centroid_blue[0]) // 2
-            robot_center_y = (centroid_pink[1] + centroid_blue[1]) // 2
+        if centroid_front and centroid_back:
+            robot_center_x = (centroid_front[0] + centroid_back[0]) // 2
+            robot_center_y = (centroid_front[1] + centroid_back[1]) // 2
             robot_center = (robot_center_x, robot_center_y)
-            if self.debug_mode and output_img is not None:
-                cv2.circle(output_img, robot_center, 5, (255, 255, 0), -1)
 
-            robot_dx = centroid_pink[0] - centroid_blue[0] 
-            robot_dy = centroid_pink[1] - centroid_blue[1] 
+            robot_dx = centroid_front[0] - centroid_back[0]
+            robot_dy = centroid_front[1] - centroid_back[1]
             robot_heading_rad = math.atan2(-robot_dy, robot_dx)
 
-        lower_green, upper_green = current_hsv_cv["green"]
-        mask_green = cv2.inRange(hsv_img, lower_green, upper_green)
-        mask_green = cv2.morphologyEx(mask_green, cv2.MORPH_OPEN, self.KERNEL_MORPH_OPEN)
-        mask_green = cv2.morphologyEx(mask_green, cv2.MORPH_CLOSE, self.KERNEL_MORPH_CLOSE_7x7)
-        centroid_green, _ = self._find_largest_contour_and_centroid(mask_green, min_area=min_area_green)
-        
-        if centroid_green and self.debug_mode and output_img is not None:
-            cv2.circle(output_img, centroid_green, 5, (0, 255, 0), -1)
-
-        if robot_center and centroid_green:
-            if self.debug_mode and output_img is not None:
-                cv2.line(output_img, robot_center, centroid_green, (0, 255, 255), 2)
-
-            distance_to_target = math.hypot(centroid_green[0] - robot_center[0], centroid_green[1] - robot_center[1])
-            
-            target_dx = centroid_green[0] - robot_center[0]
-            target_dy = centroid_green[1] - robot_center[1]
-            world_angle_to_target_rad = math.atan2(-target_dy, target_dx)
-            
-            if robot_heading_rad is not None:
-                steer_angle_rad = world_angle_to_target_rad - robot_heading_rad
-                steer_angle_rad = (steer_angle_rad + math.pi) % (2 * math.pi) - math.pi
-                angle_to_target_deg = math.degrees(steer_angle_rad)
-            else:
-                angle_to_target_deg = math.degrees(world_angle_to_target_rad)
-
-            if self.debug_mode and output_img is not None:
-                mid_line_x = (robot_center[0] + centroid_green[0]) // 2
-                mid_line_y = (robot_center[1] + centroid_green[1]) // 2
-                
-                dist_text = f"Dist: {distance_to_target:.0f}px"
-                angle_text = f"Angle: {angle_to_target_deg:.0f}deg"
-
-                font_scale = 0.5
-                thickness = 1
-                cv2.putText(output_img, dist_text, (mid_line_x + 5, mid_line_y - 5), 
-                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), thickness + 1, cv2.LINE_AA)
-                cv2.putText(output_img, dist_text, (mid_line_x + 5, mid_line_y - 5), 
-                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
-                
-                cv2.putText(output_img, angle_text, (mid_line_x + 5, mid_line_y + 15), 
-                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), thickness + 1, cv2.LINE_AA)
-                cv2.putText(output_img, angle_text, (mid_line_x + 5, mid_line_y + 15), 
-                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
-
-        if self.debug_mode and output_img is not None:
-            cv2.imshow(self.OUTPUT_WINDOW_NAME, output_img)
+        if robot_center and centroid_target:
+            distance_to_target, angle_to_target_deg = compute_target_geometry(
+                robot_center, robot_heading_rad, centroid_target)
 
-        results = {
+        return {
             "robot_center_uv": robot_center,
             "robot_heading_rad": robot_heading_rad,
-            "target_center_uv": centroid_green,
+            "target_center_uv": centroid_target,
             "distance_px": distance_to_target,
             "angle_to_target_deg": angle_to_target_deg,
-            "scale_ratio": scale_ratio
+            "front_uv": centroid_front,
+            "back_uv": centroid_back,
+        }
+
+    def _add_floor_geometry(self, robot_results, centroids, frame_width):
+        """
+        Adds floor-plane pose and target geometry in centimeters to every
+        robot result; all detected centroids are mapped in a single call.
+        """
+        detected = [color for color, centroid in centroids.items() if centroid is not None]
+        floor_points = self.calibration.pixels_to_floor([centroids[color] for color in detected], frame_width)
+        centroids_cm = {color: (float(point[0]), float(point[1])) for color, point in zip(detected, floor_points)}
+
+        for robot in self.robots:
+            front_cm = centroids_cm.get(robot.front_color)
+            back_cm = centroids_cm.get(robot.back_color)
+            target_cm = centroids_cm.get(robot.target_color)
+
+            robot_center_cm = None
+            robot_heading_floor_rad = None
+            distance_cm = None
+            angle_to_target_floor_deg = None
+            if front_cm and back_cm:
+                robot_center_cm = ((front_cm[0] + back_cm[0]) / 2, (front_cm[1] + back_cm[1]) / 2)
+                robot_heading_floor_rad = math.atan2(-(front_cm[1] - back_cm[1]), front_cm[0] - back_cm[0])
+            if robot_center_cm and target_cm:
+                distance_cm, angle_to_target_floor_deg = compute_target_geometry(
+                    robot_center_cm, robot_heading_floor_rad, target_cm)
+
+            robot_results[robot.name].update({
+                "robot_center_cm": robot_center_cm,
+                "robot_heading_floor_rad": robot_heading_floor_rad,
+                "target_center_cm": target_cm,
+                "distance_cm": distance_cm,
+                "angle_to_target_floor_deg": angle_to_target_floor_deg,
+            })
+
+    def get_processing_results(self, original_img, base_min_area_scale_factor=1.0):
+        self.profiler.start()
+        if self.motion_gate is not None and self._last_results is not None:
+            if not self.motion_gate.should_process(original_img):
+                self.profiler.lap("gate")
+                self.profiler.finish()
+                return dict(self._last_results, cached=True)
+            self.profiler.lap("gate")
+        started = time.perf_counter()
+        if self.resolution_controller is not None:
+            self.process_frame_width = self.resolution_controller.width
+        scale_ratio = 1.0
+        if self.process_frame_width and original_img.shape[1] > self.process_frame_width:
+            scale_ratio = self.process_frame_width / original_img.shape[1]
+            height = int(original_img.shape[0] * scale_ratio)
+            processed_img = cv2.resize(original_img, (self.process_frame_width, height), interpolation=cv2.INTER_AREA)
+        else:
+            processed_img = original_img.copy()
+        self.profiler.lap("resize")
+
+        current_min_area_scale = (scale_ratio ** 2) * base_min_area_scale_factor
+        
+        centroids, detection_path = self._detect_markers(processed_img, current_min_area_scale)
+        process_width = processed_img.shape[1]
+        refined = self.pyramid_refine and scale_ratio != 1.0
+        if refined:
+            centroids = self._refine_markers(original_img, centroids, scale_ratio, base_min_area_scale_factor)
+            scale_ratio = 1.0
+            coordinate_width = original_img.shape[1]
+        elif self.resolution_controller is not None:
+            coordinate_width = min(original_img.shape[1], self.resolution_controller.widths[-1])
+            if coordinate_width != process_width:
+                centroids = self._rescale_centroids(centroids, coordinate_width / process_width)
+                scale_ratio = coordinate_width / original_img.shape[1]
+        else:
+            coordinate_width = process_width
+
+        robot_results = {robot.name: self._compute_robot_pose(robot, centroids) for robot in self.robots}
+        primary = robot_results[self.robots[0].name]
+        self.profiler.lap("geometry")
+        if self.calibration is not None:
+            self._add_floor_geometry(robot_results, centroids, coordinate_width)
+            self.profiler.lap("floor")
+
+        results = {
+            "robot_center_uv": primary["robot_center_uv"],
+            "robot_heading_rad": primary["robot_heading_rad"],
+            "target_center_uv": primary["target_center_uv"],
+            "distance_px": primary["distance_px"],
+            "angle_to_target_deg": primary["angle_to_target_deg"],
+            "scale_ratio": scale_ratio,
+            "process_width": process_width,
+            "refined": refined,
+            "cached": False,
+            "detection_path": detection_path,
+            "marker_centers_uv": centroids,
+            "robots": robot_results,
         }
+        if self.calibration is not None:
+            results["distance_cm"] = primary["distance_cm"]
+            results["angle_to_target_floor_deg"] = primary["angle_to_target_floor_deg"]
+        if self.resolution_controller is not None:
+            self.resolution_controller.record(time.perf_counter() - started)
+        self._last_results = results
+        self.profiler.finish()
         return results
 
+    def get_profile_summary(self) -> dict[str, dict]:
+        return self.profiler.summary()
+
     def get_current_hsv_ranges(self):
         return self.hsv_ranges
 
-    def release_windows(self):
-        if self.debug_mode:
-            if cv2.getWindowProperty(self.OUTPUT_WINDOW_NAME, cv2.WND_PROP_VISIBLE) >= 1:
-                cv2.destroyWindow(self.OUTPUT_WINDOW_NAME)
+    def set_hsv_ranges(self, hsv_ranges):
+        """
+        Replaces the ranges of the given colors; safe to call from another
+        thread. The ranges dict is swapped as a whole and read once per frame,
+        so a frame never mixes old and new ranges.
+        """
+        updated = {k: list(v) for k, v in self.hsv_ranges.items()}
+        updated.update({k: list(v) for k, v in hsv_ranges.items()})
+        self.hsv_ranges = updated
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from common.logged import LoggedClass
+
+
+@dataclass
+class CapturedFrame:
+    image: np.ndarray
+    index: int
+    timestamp: float
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.timestamp
+
+
+class FrameGrabber(LoggedClass):
+    """
+    Reads the camera on a background thread and keeps only the newest frames,
+    so the consumer never works through a backlog of stale images.
+    """
+    DEFAULT_BUFFER_SIZE = 2
+    DEFAULT_MAX_FRAME_AGE_S = 0.1
+    MAX_CONSECUTIVE_READ_FAILURES = 5
+
+    def __init__(self,
+                 source=0,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 max_frame_age_s: float = DEFAULT_MAX_FRAME_AGE_S):
+        super().__init__()
+        self.source = source
+        self.max_frame_age_s = max_frame_age_s
+
+        self._cap = None
+        self._buffer: deque[CapturedFrame] = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._running = False
+        self._last_consumed_index = -1
+
+        self.frames_captured = 0
+        self.frames_consumed = 0
+        self.frames_dropped = 0
+        self.frames_stale = 0
+        self.read_failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> bool:
+        if isinstance(self.source, (int, str)):
+            self._cap = cv2.VideoCapture(self.source)
+            self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        else:
+            self._cap = self.source
+        if not self._cap.isOpened():
+            self.logger.error(f"Failed to open capture source: {self.source}")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, name="frame-grabber", daemon=True)
+        self._thread.start()
+        self.logger.success(f"Frame grabber started: {self.source}")
+        return True
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        self.logger.info(f"Frame grabber stopped: {self.get_stats()}")
+
+    def _grab_loop(self) -> None:
+        consecutive_failures = 0
+        while self._running:
+            ret, image = self._cap.read()
+            timestamp = time.monotonic()
+            if not ret:
+                self.read_failures += 1
+                consecutive_failures += 1
+                if consecutive_failures >= self.MAX_CONSECUTIVE_READ_FAILURES:
+                    self.logger.error("Camera stopped delivering frames")
+                    break
+                continue
+            consecutive_failures = 0
+
+            with self._condition:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.frames_dropped += 1
+                self._buffer.append(CapturedFrame(image=image, index=self.frames_captured, timestamp=timestamp))
+                self.frames_captured += 1
+                self._condition.notify_all()
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def read(self, timeout: float | None = None) -> CapturedFrame | None:
+        """
+        Returns the newest frame that has not been consumed yet. Older buffered
+        frames are discarded. Returns None on timeout or once the grabber stops.
+        """
+        with self._condition:
+            has_new_frame = self._condition.wait_for(
+                lambda: not self._running or (self._buffer and self._buffer[-1].index > self._last_consumed_index),
+                timeout=timeout,
+            )
+            if not has_new_frame or not self._buffer or self._buffer[-1].index <= self._last_consumed_index:
+                return None
+
+            frame = self._buffer.pop()
+            self.frames_dropped += len(self._buffer)
+            self._buffer.clear()
+
+        self._last_consumed_index = frame.index
+        self.frames_consumed += 1
+        if frame.age > self.max_frame_age_s:
+            self.frames_stale += 1
+        return frame
+
+    def get_stats(self) -> dict:
+        return {
+            "captured": self.frames_captured,
+            "consumed": self.frames_consumed,
+            "dropped": self.frames_dropped,
+            "stale": self.frames_stale,
+            "read_failures": self.read_failures,
+        }
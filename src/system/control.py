@@ -9,140 +9,138 @@ class RobotAction:
     def __repr__(self):
         return f"RobotAction(command='{self.command}', speed={self.speed}, turn_angle_change={self.turn_angle_change})"
 
-class State:
-    def __init__(self, fsm):
-        self.fsm = fsm
-
-    def enter(self, **kwargs):
-        pass
-
-    def execute(self, angle_to_target: float, distance_to_target: float) -> RobotAction:
-        raise NotImplementedError
-
-    def exit(self):
-        pass
-
-class IdleState(State):
-    def execute(self, angle_to_target: float, distance_to_target: float) -> RobotAction:
-        return RobotAction(command="idle")
-
-class OrientingState(State):
-    def execute(self, angle_to_target: float, distance_to_target: float) -> RobotAction:
-        if abs(angle_to_target) > self.fsm.straight_angle_threshold:
-            if angle_to_target > 0:
-                return RobotAction(command="turn_left", speed=self.fsm.turn_speed, turn_angle_change=angle_to_target)
-            else:
-                return RobotAction(command="turn_right", speed=self.fsm.turn_speed, turn_angle_change=angle_to_target)
-        else:
-            self.fsm.transition_to(self.fsm.states[RobotStates.MOVING_FORWARD])
-            return self.fsm.current_state.execute(angle_to_target, distance_to_target)
-
-class MovingForwardState(State):
-    def execute(self, angle_to_target: float, distance_to_target: float) -> RobotAction:
-        if distance_to_target <= self.fsm.distance_tolerance:
-            self.fsm.transition_to(self.fsm.states[RobotStates.GOAL_REACHED])
-            return RobotAction(command="stop")
-        elif abs(angle_to_target) > self.fsm.straight_angle_threshold:
-            self.fsm.transition_to(self.fsm.states[RobotStates.ORIENTING])
-            return self.fsm.current_state.execute(angle_to_target, distance_to_target)
-        else:
-            return RobotAction(command="move_forward", speed=self.fsm.move_speed)
-
-class GoalReachedState(State):
-    def execute(self, angle_to_target: float, distance_to_target: float) -> RobotAction:
-        return RobotAction(command="stop")
-
 class RobotStates(Enum):
     IDLE = auto()
     ORIENTING = auto()
     MOVING_FORWARD = auto()
     GOAL_REACHED = auto()
 
+class MeasurementZone(Enum):
+    LOST = auto()
+    NEAR_ALIGNED = auto()
+    NEAR_MISALIGNED = auto()
+    FAR_ALIGNED = auto()
+    FAR_MISALIGNED = auto()
+
+# Next state for each state and measurement zone. "Near" is within
+# distance_tolerance, "aligned" within straight_angle_threshold. The action
+# follows from the state entered: idle, turn towards the target, move forward or stop.
+TRANSITIONS: dict[RobotStates, dict[MeasurementZone, RobotStates]] = {
+    RobotStates.IDLE: {
+        MeasurementZone.LOST: RobotStates.IDLE,
+        MeasurementZone.NEAR_ALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.NEAR_MISALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.FAR_ALIGNED: RobotStates.MOVING_FORWARD,
+        MeasurementZone.FAR_MISALIGNED: RobotStates.ORIENTING,
+    },
+    RobotStates.ORIENTING: {
+        MeasurementZone.LOST: RobotStates.IDLE,
+        MeasurementZone.NEAR_ALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.NEAR_MISALIGNED: RobotStates.ORIENTING,
+        MeasurementZone.FAR_ALIGNED: RobotStates.MOVING_FORWARD,
+        MeasurementZone.FAR_MISALIGNED: RobotStates.ORIENTING,
+    },
+    RobotStates.MOVING_FORWARD: {
+        MeasurementZone.LOST: RobotStates.IDLE,
+        MeasurementZone.NEAR_ALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.NEAR_MISALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.FAR_ALIGNED: RobotStates.MOVING_FORWARD,
+        MeasurementZone.FAR_MISALIGNED: RobotStates.ORIENTING,
+    },
+    RobotStates.GOAL_REACHED: {
+        MeasurementZone.LOST: RobotStates.IDLE,
+        MeasurementZone.NEAR_ALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.NEAR_MISALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.FAR_ALIGNED: RobotStates.GOAL_REACHED,
+        MeasurementZone.FAR_MISALIGNED: RobotStates.GOAL_REACHED,
+    },
+}
+
+def classify_measurement(angle_to_target: float | None,
+                         distance_to_target: float | None,
+                         distance_tolerance: float,
+                         straight_angle_threshold: float) -> MeasurementZone:
+    if angle_to_target is None or distance_to_target is None:
+        return MeasurementZone.LOST
+    aligned = abs(angle_to_target) <= straight_angle_threshold
+    if distance_to_target <= distance_tolerance:
+        return MeasurementZone.NEAR_ALIGNED if aligned else MeasurementZone.NEAR_MISALIGNED
+    return MeasurementZone.FAR_ALIGNED if aligned else MeasurementZone.FAR_MISALIGNED
+
+def step(state: RobotStates, zone: MeasurementZone) -> RobotStates:
+    return TRANSITIONS[state][zone]
+
 class RobotNavigationFSM:
+    """
+    Navigation state machine driven by the TRANSITIONS table: every
+    measurement is classified into a MeasurementZone, step() gives the next
+    state and the action is derived from that state. system/sweep.py runs the
+    same table over many threshold combinations at once.
+    """
     DEFAULT_STRAIGHT_ANGLE_THRESHOLD_DEG = 40.0
+    DEFAULT_FULL_SPEED_ANGLE_DEG = 90.0
+    DEFAULT_FULL_SPEED_DISTANCE = 200.0
+    DEFAULT_MIN_SPEED_FRACTION = 0.3
 
     def __init__(self, 
                  angle_tolerance: float,
                  distance_tolerance: float,
                  turn_speed: float, 
                  move_speed: float,
-                 straight_angle_threshold: float = DEFAULT_STRAIGHT_ANGLE_THRESHOLD_DEG):
+                 straight_angle_threshold: float = DEFAULT_STRAIGHT_ANGLE_THRESHOLD_DEG,
+                 proportional: bool = False,
+                 full_speed_angle: float = DEFAULT_FULL_SPEED_ANGLE_DEG,
+                 full_speed_distance: float = DEFAULT_FULL_SPEED_DISTANCE,
+                 min_speed_fraction: float = DEFAULT_MIN_SPEED_FRACTION):
         
+        # angle_tolerance is not part of the transition rules: turning stops at straight_angle_threshold
         self.angle_tolerance = angle_tolerance
         self.distance_tolerance = distance_tolerance
         self.turn_speed = turn_speed
         self.move_speed = move_speed
         self.straight_angle_threshold = straight_angle_threshold 
+        # proportional: speed drops as the error shrinks, and forward moves carry a heading correction
+        self.proportional = proportional
+        self.full_speed_angle = full_speed_angle
+        self.full_speed_distance = full_speed_distance
+        self.min_speed_fraction = min_speed_fraction
 
-        self._target_angle: float = 0.0
-        self._target_distance: float = 0.0
-        self._has_target: bool = False
-
-        self.states = {
-            RobotStates.IDLE: IdleState(self),
-            RobotStates.ORIENTING: OrientingState(self),
-            RobotStates.MOVING_FORWARD: MovingForwardState(self),
-            RobotStates.GOAL_REACHED: GoalReachedState(self),
-        }
         self.current_state_enum = RobotStates.IDLE
-        self.current_state: State = self.states[self.current_state_enum]
-        self.current_state.enter()
-
-    def transition_to(self, new_state_obj: State):
-        if self.current_state == new_state_obj:
-            return
-
-        self.current_state.exit()
-        self.current_state = new_state_obj
-        for enum_key, state_val in self.states.items():
-            if state_val == new_state_obj:
-                self.current_state_enum = enum_key
-                break
-        self.current_state.enter()
-
-    def set_target(self, angle_to_target: float, distance_to_target: float):
-        self._target_angle = angle_to_target
-        self._target_distance = distance_to_target
-        self._has_target = True
-
-        if self.current_state_enum == RobotStates.IDLE or self.current_state_enum == RobotStates.GOAL_REACHED:
-            if self._target_distance > self.distance_tolerance:
-                if abs(self._target_angle) <= self.straight_angle_threshold:
-                    self.transition_to(self.states[RobotStates.MOVING_FORWARD])
-                elif abs(self._target_angle) > self.angle_tolerance:
-                    self.transition_to(self.states[RobotStates.ORIENTING])
-                    self.transition_to(self.states[RobotStates.ORIENTING])
-            else:
-                self.transition_to(self.states[RobotStates.GOAL_REACHED])
 
-    def update(self, current_angle_to_target: float, current_distance_to_target: float) -> RobotAction:
-        self._target_angle = current_angle_to_target
-        self._target_distance = current_distance_to_target
-
-        if not self._has_target:
-            if self.current_state_enum != RobotStates.IDLE:
-                self.transition_to(self.states[RobotStates.IDLE])
-            return self.current_state.execute(0.0, 0.0) 
-
-        if self.current_state_enum == RobotStates.IDLE and self._has_target:
-            if self._target_distance > self.distance_tolerance:
-                if abs(self._target_angle) <= self.straight_angle_threshold:
-                    self.transition_to(self.states[RobotStates.MOVING_FORWARD])
-                elif abs(self._target_angle) > self.angle_tolerance:
-                    self.transition_to(self.states[RobotStates.ORIENTING])
-                else:
-                    self.transition_to(self.states[RobotStates.ORIENTING])
-            else:
-                self.transition_to(self.states[RobotStates.GOAL_REACHED])
-            return self.current_state.execute(self._target_angle, self._target_distance)
-        
-        action = self.current_state.execute(self._target_angle, self._target_distance)
-        return action
-
-    def clear_target(self):
-        self._has_target = False
-        if self.current_state_enum not in [RobotStates.IDLE, RobotStates.GOAL_REACHED]:
-            self.transition_to(self.states[RobotStates.IDLE])
+    @property
+    def at_rest(self) -> bool:
+        return self.current_state_enum in (RobotStates.IDLE, RobotStates.GOAL_REACHED)
+
+    def speed_scale(self, error: float, full_speed_error: float) -> float:
+        """
+        Fraction of the nominal speed for the remaining error: 1.0 in bang-bang
+        mode, otherwise linear in the error between min_speed_fraction and 1.0.
+        """
+        if not self.proportional:
+            return 1.0
+        return min(1.0, max(self.min_speed_fraction, error / full_speed_error))
+
+    def _action(self, angle_to_target: float, distance_to_target: float) -> RobotAction:
+        state = self.current_state_enum
+        if state == RobotStates.IDLE:
+            return RobotAction(command="idle")
+        if state == RobotStates.GOAL_REACHED:
+            return RobotAction(command="stop")
+        if state == RobotStates.ORIENTING:
+            speed = self.turn_speed * self.speed_scale(abs(angle_to_target), self.full_speed_angle)
+            command = "turn_left" if angle_to_target > 0 else "turn_right"
+            return RobotAction(command=command, speed=speed, turn_angle_change=angle_to_target)
+        if self.proportional:
+            remaining = distance_to_target - self.distance_tolerance
+            speed = self.move_speed * self.speed_scale(remaining, self.full_speed_distance)
+            return RobotAction(command="move_forward", speed=speed, turn_angle_change=angle_to_target)
+        return RobotAction(command="move_forward", speed=self.move_speed)
+
+    def process_measurement(self, angle_to_target: float | None, distance_to_target: float | None) -> RobotAction:
+        zone = classify_measurement(angle_to_target, distance_to_target,
+                                    self.distance_tolerance, self.straight_angle_threshold)
+        self.current_state_enum = step(self.current_state_enum, zone)
+        return self._action(angle_to_target, distance_to_target)
 
     def get_current_state_name(self) -> str:
         return self.current_state_enum.name
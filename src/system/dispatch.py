@@ -0,0 +1,99 @@
+from enum import Enum
+from common.command import Command, CommandWithArguments
+
+class DispatchDecision(Enum):
+    STOP = "stop"
+    CHANGED = "changed"
+    KEEPALIVE = "keepalive"
+    COALESCED = "coalesced"
+    RATE_LIMITED = "rate_limited"
+
+    @property
+    def sends(self) -> bool:
+        return self in (DispatchDecision.STOP, DispatchDecision.CHANGED, DispatchDecision.KEEPALIVE)
+
+class CommandDispatcher:
+    """
+    Decides which FSM commands reach the robot:
+    - STOP goes out at once, unless STOP was already the last command sent;
+    - a command that differs from the last sent one goes out at once;
+    - a repeat of the last command is a keepalive and needs a token from a
+      bucket refilled every keepalive_interval_s (up to burst tokens).
+    Every send takes a token, so a keepalive never follows a fresh send
+    sooner than the interval. Numeric arguments closer than
+    change_tolerance to the last sent ones count as a repeat; "duration"
+    is ignored in the comparison.
+    """
+    DEFAULT_CHANGE_TOLERANCE = 0.05
+    IGNORED_ARGUMENTS = ("duration",)
+
+    def __init__(self,
+                 keepalive_interval_s: float,
+                 burst: int = 1,
+                 change_tolerance: float = DEFAULT_CHANGE_TOLERANCE):
+        self.keepalive_interval_s = keepalive_interval_s
+        self.burst = burst
+        self.change_tolerance = change_tolerance
+
+        self._tokens = float(burst)
+        self._tokens_updated_at: float | None = None
+        self.last_sent: CommandWithArguments | None = None
+        self.last_send_time: float | None = None
+
+        self.sent = {decision: 0 for decision in DispatchDecision if decision.sends}
+        self.suppressed = {decision: 0 for decision in DispatchDecision if not decision.sends}
+        self.send_failures = 0
+
+    def _refill(self, now: float) -> None:
+        if self._tokens_updated_at is not None and self.keepalive_interval_s > 0:
+            elapsed = now - self._tokens_updated_at
+            self._tokens = min(float(self.burst), self._tokens + elapsed / self.keepalive_interval_s)
+        elif self.keepalive_interval_s <= 0:
+            self._tokens = float(self.burst)
+        self._tokens_updated_at = now
+
+    def _is_repeat(self, command: CommandWithArguments) -> bool:
+        last = self.last_sent
+        if last is None or last.command != command.command:
+            return False
+        for name in set(command.args) | set(last.args):
+            if name in self.IGNORED_ARGUMENTS:
+                continue
+            if name not in command.args or name not in last.args:
+                return False
+            if abs(command.args[name] - last.args[name]) > self.change_tolerance:
+                return False
+        return True
+
+    def decide(self, command: CommandWithArguments, now: float) -> DispatchDecision:
+        self._refill(now)
+        if not self._is_repeat(command):
+            decision = DispatchDecision.STOP if command.command == Command.STOP else DispatchDecision.CHANGED
+        elif command.command == Command.STOP:
+            decision = DispatchDecision.COALESCED
+        elif self._tokens >= 1.0:
+            decision = DispatchDecision.KEEPALIVE
+        else:
+            decision = DispatchDecision.RATE_LIMITED
+
+        if not decision.sends:
+            self.suppressed[decision] += 1
+        return decision
+
+    def record_send(self, command: CommandWithArguments, decision: DispatchDecision, now: float, ok: bool) -> None:
+        if not ok:
+            self.send_failures += 1
+            return
+        self._tokens = max(0.0, self._tokens - 1.0)
+        self.last_sent = command
+        self.last_send_time = now
+        self.sent[decision] += 1
+
+    def get_stats(self, now: float) -> dict:
+        return {
+            "sent": {decision.value: count for decision, count in self.sent.items()},
+            "suppressed": {decision.value: count for decision, count in self.suppressed.items()},
+            "send_failures": self.send_failures,
+            "last_command": self.last_sent.command.value if self.last_sent else None,
+            "last_command_age_s": now - self.last_send_time if self.last_send_time is not None else None,
+        }
@@ -0,0 +1,183 @@
+import math
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from system.camera import compute_target_geometry
+
+
+def wrap_angle(angle_rad):
+    return (angle_rad + math.pi) % (2 * math.pi) - math.pi
+
+
+class ConstantVelocityKalman:
+    """
+    Kalman filter with a [position, velocity] state per axis, driven by white
+    acceleration noise. Positions are measured, velocities are inferred.
+    """
+
+    def __init__(self, dims: int, process_noise: float, measurement_noise: float, angular: bool = False):
+        self.dims = dims
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.angular = angular
+
+        self._H = np.hstack([np.eye(dims), np.zeros((dims, dims))])
+        self._R = np.eye(dims) * measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.x = np.zeros(2 * self.dims)
+        self.P = np.eye(2 * self.dims)
+        self.timestamp: float | None = None
+
+    @property
+    def initialized(self) -> bool:
+        return self.timestamp is not None
+
+    def _transition(self, dt: float):
+        eye = np.eye(self.dims)
+        F = np.block([[eye, dt * eye], [np.zeros_like(eye), eye]])
+        q = self.process_noise
+        Q = q * np.block([[dt ** 3 / 3 * eye, dt ** 2 / 2 * eye], [dt ** 2 / 2 * eye, dt * eye]])
+        return F, Q
+
+    def _predicted(self, timestamp: float):
+        dt = max(timestamp - self.timestamp, 0.0)
+        F, Q = self._transition(dt)
+        return F @ self.x, F @ self.P @ F.T + Q
+
+    def predict(self, timestamp: float) -> np.ndarray:
+        x, _ = self._predicted(timestamp)
+        position = x[:self.dims]
+        return wrap_angle(position) if self.angular else position
+
+    def update(self, measurement, timestamp: float):
+        z = np.atleast_1d(np.asarray(measurement, dtype=float))
+        if not self.initialized:
+            self.x = np.concatenate([z, np.zeros(self.dims)])
+            self.P = np.diag([self.measurement_noise] * self.dims + [1e4] * self.dims)
+            self.timestamp = timestamp
+            return
+
+        x, P = self._predicted(timestamp)
+        innovation = z - self._H @ x
+        if self.angular:
+            innovation = wrap_angle(innovation)
+        S = self._H @ P @ self._H.T + self._R
+        K = P @ self._H.T @ np.linalg.inv(S)
+        self.x = x + K @ innovation
+        self.P = (np.eye(2 * self.dims) - K @ self._H) @ P
+        if self.angular:
+            self.x[:self.dims] = wrap_angle(self.x[:self.dims])
+        self.timestamp = max(timestamp, self.timestamp)
+
+
+@dataclass
+class PoseEstimate:
+    robot_center: tuple[float, float]
+    robot_heading_rad: float | None
+    target_center: tuple[float, float]
+    distance: float
+    angle_to_target_deg: float
+    measurement_age_s: float
+    units: str
+
+
+class PoseEstimator:
+    """
+    Filters the camera results and predicts them forward to the moment a
+    command will act on the robot, bridging short detection gaps.
+
+    Measurements are stamped with the frame capture time, so predicting to the
+    control tick already covers the capture-to-control latency; the
+    actuation latency (publish + robot reaction) is added on top.
+
+    units selects the measurements: "px" filters the image-pixel pose, "cm"
+    the floor pose a calibrated CameraProcessor reports.
+    """
+    MEASUREMENT_KEYS = {
+        "px": ("robot_center_uv", "robot_heading_rad", "target_center_uv"),
+        "cm": ("robot_center_cm", "robot_heading_floor_rad", "target_center_cm"),
+    }
+    DEFAULT_MAX_GAP_S = 0.5
+    DEFAULT_ACTUATION_LATENCY_S = 0.05
+    DEFAULT_POSITION_PROCESS_NOISE = 2000.0
+    DEFAULT_POSITION_MEASUREMENT_NOISE = 4.0
+    DEFAULT_HEADING_PROCESS_NOISE = 5.0
+    DEFAULT_HEADING_MEASUREMENT_NOISE = 0.01
+    LATENCY_SMOOTHING = 0.1
+
+    def __init__(self,
+                 max_gap_s: float = DEFAULT_MAX_GAP_S,
+                 actuation_latency_s: float = DEFAULT_ACTUATION_LATENCY_S,
+                 position_process_noise: float = DEFAULT_POSITION_PROCESS_NOISE,
+                 position_measurement_noise: float = DEFAULT_POSITION_MEASUREMENT_NOISE,
+                 heading_process_noise: float = DEFAULT_HEADING_PROCESS_NOISE,
+                 heading_measurement_noise: float = DEFAULT_HEADING_MEASUREMENT_NOISE,
+                 units: str = "px"):
+        if units not in self.MEASUREMENT_KEYS:
+            raise ValueError(f"Unknown pose units: {units}")
+        self.units = units
+        self._robot_key, self._heading_key, self._target_key = self.MEASUREMENT_KEYS[units]
+        self.max_gap_s = max_gap_s
+        self.actuation_latency_s = actuation_latency_s
+
+        self.robot_filter = ConstantVelocityKalman(2, position_process_noise, position_measurement_noise)
+        self.heading_filter = ConstantVelocityKalman(1, heading_process_noise, heading_measurement_noise, angular=True)
+        self.target_filter = ConstantVelocityKalman(2, position_process_noise, position_measurement_noise)
+
+        self.pipeline_latency_s: float | None = None
+
+    def reset(self):
+        self.robot_filter.reset()
+        self.heading_filter.reset()
+        self.target_filter.reset()
+        self.pipeline_latency_s = None
+
+    def update(self, results: dict, capture_timestamp: float):
+        if results.get(self._robot_key) is not None:
+            self.robot_filter.update(results[self._robot_key], capture_timestamp)
+        if results.get(self._heading_key) is not None:
+            self.heading_filter.update(results[self._heading_key], capture_timestamp)
+        if results.get(self._target_key) is not None:
+            self.target_filter.update(results[self._target_key], capture_timestamp)
+
+        latency = time.monotonic() - capture_timestamp
+        if self.pipeline_latency_s is None:
+            self.pipeline_latency_s = latency
+        else:
+            self.pipeline_latency_s += self.LATENCY_SMOOTHING * (latency - self.pipeline_latency_s)
+
+    def _is_fresh(self, kalman: ConstantVelocityKalman, now: float) -> bool:
+        return kalman.initialized and now - kalman.timestamp <= self.max_gap_s
+
+    def estimate(self, now: float | None = None) -> PoseEstimate | None:
+        """
+        Returns the pose predicted to now + actuation latency, or None when the
+        robot or the target has not been seen for longer than max_gap_s.
+        """
+        if now is None:
+            now = time.monotonic()
+        if not (self._is_fresh(self.robot_filter, now) and self._is_fresh(self.target_filter, now)):
+            return None
+
+        horizon = now + self.actuation_latency_s
+        robot_center = tuple(float(v) for v in self.robot_filter.predict(horizon))
+        target_center = tuple(float(v) for v in self.target_filter.predict(horizon))
+        heading = None
+        if self._is_fresh(self.heading_filter, now):
+            heading = float(self.heading_filter.predict(horizon)[0])
+
+        distance, angle_to_target_deg = compute_target_geometry(robot_center, heading, target_center)
+        measurement_age_s = now - min(self.robot_filter.timestamp, self.target_filter.timestamp)
+        return PoseEstimate(
+            robot_center=robot_center,
+            robot_heading_rad=heading,
+            target_center=target_center,
+            distance=distance,
+            angle_to_target_deg=angle_to_target_deg,
+            measurement_age_s=measurement_age_s,
+            units=self.units,
+        )
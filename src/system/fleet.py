@@ -0,0 +1,142 @@
+from common.command import Command, CommandWithArguments
+from system.broker import CommandSender
+from system.control import RobotNavigationFSM, RobotAction
+from system.dispatch import CommandDispatcher, DispatchDecision
+from system.estimation import PoseEstimator
+
+ACTION_COMMANDS = {
+    "idle": Command.STOP,
+    "turn_right": Command.TURN_RIGHT,
+    "turn_left": Command.TURN_LEFT,
+    "move_forward": Command.MOVE_FORWARD,
+    "stop": Command.STOP,
+}
+
+def action_to_command(action: RobotAction | None) -> Command | None:
+    if action is None:
+        return None
+    return ACTION_COMMANDS.get(action.command)
+
+def action_to_drive_command(action: RobotAction, steering_gain_per_deg: float, duration_s: float) -> CommandWithArguments:
+    """
+    Converts an action of the proportional FSM into a DRIVE command: turns in
+    place use action.speed as the turn rate, forward motion steers towards
+    the target proportionally to turn_angle_change.
+    """
+    if action.command == "turn_left":
+        speed, turn = 0.0, action.speed
+    elif action.command == "turn_right":
+        speed, turn = 0.0, -action.speed
+    else:
+        speed = action.speed
+        turn = max(-speed, min(speed, action.turn_angle_change * steering_gain_per_deg))
+    return CommandWithArguments(Command.DRIVE, {"speed": speed, "turn": turn, "duration": duration_s})
+
+
+class RobotChannel:
+    """
+    Control state of one robot: its pose estimator, FSM, MQTT topic and the
+    dispatcher that decides which commands are actually sent to it.
+
+    With drive_command_duration_s set, motion actions are sent as DRIVE
+    commands with PWM speed and steering that expire after that time, so the
+    robot stops by itself if the control loop goes quiet.
+    """
+
+    def __init__(self,
+                 name: str,
+                 topic: str,
+                 fsm: RobotNavigationFSM,
+                 estimator: PoseEstimator,
+                 dispatcher: CommandDispatcher,
+                 drive_command_duration_s: float | None = None,
+                 steering_gain_per_deg: float = 0.01):
+        self.name = name
+        self.topic = topic
+        self.fsm = fsm
+        self.estimator = estimator
+        self.dispatcher = dispatcher
+        self.drive_command_duration_s = drive_command_duration_s
+        self.steering_gain_per_deg = steering_gain_per_deg
+
+    @property
+    def last_sent_command(self) -> Command | None:
+        last_sent = self.dispatcher.last_sent
+        return last_sent.command if last_sent is not None else None
+
+    def update(self, results: dict, capture_timestamp: float) -> None:
+        robot_results = results.get("robots", {}).get(self.name)
+        if robot_results is not None:
+            self.estimator.update(robot_results, capture_timestamp)
+
+    def _build_command(self, action: RobotAction, command: Command) -> CommandWithArguments:
+        if self.drive_command_duration_s is None or command == Command.STOP:
+            return CommandWithArguments(command)
+        return action_to_drive_command(action, self.steering_gain_per_deg, self.drive_command_duration_s)
+
+    def control_step(self, sender: CommandSender, now: float) -> dict:
+        """
+        Runs one FSM tick and hands the resulting command to the dispatcher.
+        Returns a structured record of the tick; format_status() turns it
+        into the console status line. A send counts only once the sender
+        reports it through on_result, which may come after this returns and
+        fills in the record's "sent" and "last_sent" then.
+        """
+        estimate = self.estimator.estimate(now)
+        distance = estimate.distance if estimate else None
+        angle_deg = estimate.angle_to_target_deg if estimate else None
+
+        action = self.fsm.process_measurement(angle_deg, distance)
+        desired_command = action_to_command(action)
+
+        record = {
+            "type": "control",
+            "robot": self.name,
+            "time": now,
+            "distance": distance,
+            "units": self.estimator.units,
+            "angle_deg": angle_deg,
+            "state": self.fsm.get_current_state_name(),
+            "action": action.command,
+            "command": None,
+            "args": None,
+            "decision": None,
+            "sent": None,
+            "last_sent": self.last_sent_command.value if self.last_sent_command else None,
+        }
+        if desired_command is not None:
+            command = self._build_command(action, desired_command)
+            decision = self.dispatcher.decide(command, now)
+            record["command"] = command.command.value
+            record["args"] = command.args or None
+            record["decision"] = decision.value
+            if decision.sends:
+                sender.send(command, topic=self.topic,
+                            on_result=lambda ok: self._record_send(record, command, decision, now, ok))
+        return record
+
+    def _record_send(self, record: dict, command: CommandWithArguments, decision: DispatchDecision,
+                     now: float, ok: bool) -> None:
+        self.dispatcher.record_send(command, decision, now, ok)
+        record["sent"] = ok
+        record["last_sent"] = self.last_sent_command.value if self.last_sent_command else None
+
+def format_status(record: dict) -> str:
+    if record["command"] is None:
+        sent_status = "No MQTT Cmd This Frame"
+    elif record["sent"] is None and DispatchDecision(record["decision"]).sends:
+        sent_status = f"Pending ({record['command']})"
+    elif record["sent"] is None:
+        sent_status = f"{record['decision'].capitalize()} ({record['command']})"
+    elif record["sent"]:
+        sent_status = f"{record['command']} ({record['decision']})"
+        if record["args"]:
+            sent_status += " " + ", ".join(f"{k}={v:.2f}" for k, v in record["args"].items())
+    else:
+        sent_status = "MQTT Send FAIL"
+
+    dist_str = f"{record['distance']:.1f} {record['units']}" if record["distance"] is not None else "N/A"
+    angle_str = f"{record['angle_deg']:.1f} deg" if record["angle_deg"] is not None else "N/A"
+    return (f"[{record['robot']}] Dist: {dist_str}, Angle: {angle_str}, FSM State: {record['state']}, "
+            f"FSM Action: {record['action']}, Desired MQTT: {record['command'] or 'None'}, "
+            f"SentToMQTT: {sent_status}, LastSentToRobot: {record['last_sent'] or 'None'}")
@@ -0,0 +1,83 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap change detector in front of the full processing pipeline. Every
+    frame is shrunk to a small thumbnail and compared with the thumbnail of
+    the last fully processed frame; when fewer than min_changed_values pixel
+    channels differ by more than pixel_threshold, the frame counts
+    as unchanged and its processing can be skipped. Comparing against the last
+    processed frame rather than the previous one lets slow drift add up until
+    it is noticed. Color is kept because the markers often differ from the
+    floor more in hue than in brightness. A full pass is still forced every refresh_interval_s.
+
+    The gate only skips frames while enabled, which the runtime sets while
+    every robot is at rest (IDLE or GOAL_REACHED).
+    """
+    DEFAULT_THUMBNAIL_WIDTH = 160
+    DEFAULT_PIXEL_THRESHOLD = 20
+    DEFAULT_MIN_CHANGED_VALUES = 3
+    DEFAULT_REFRESH_INTERVAL_S = 1.0
+
+    def __init__(self,
+                 thumbnail_width: int = DEFAULT_THUMBNAIL_WIDTH,
+                 pixel_threshold: int = DEFAULT_PIXEL_THRESHOLD,
+                 min_changed_values: int = DEFAULT_MIN_CHANGED_VALUES,
+                 refresh_interval_s: float = DEFAULT_REFRESH_INTERVAL_S,
+                 enabled: bool = False):
+        self.thumbnail_width = thumbnail_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_values = min_changed_values
+        self.refresh_interval_s = refresh_interval_s
+        self.enabled = enabled
+
+        self._reference: np.ndarray | None = None
+        self._reference_time: float | None = None
+
+        self.frames_skipped = 0
+        self.frames_passed = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        # a bilinear step to twice the size and a 2x area step average out sensor
+        # noise at a fraction of the cost of one large INTER_AREA reduction
+        height = max(1, frame.shape[0] * self.thumbnail_width // frame.shape[1])
+        small = cv2.resize(frame, (2 * self.thumbnail_width, 2 * height), interpolation=cv2.INTER_LINEAR)
+        return cv2.resize(small, (self.thumbnail_width, height), interpolation=cv2.INTER_AREA)
+
+    def should_process(self, frame: np.ndarray, now: float | None = None) -> bool:
+        """
+        Returns False when the frame may be skipped; a frame that must be
+        processed becomes the new reference.
+        """
+        if not self.enabled:
+            self._reference = None
+            self.frames_passed += 1
+            return True
+        if now is None:
+            now = time.monotonic()
+
+        thumbnail = self._thumbnail(frame)
+        if (self._reference is not None
+                and self._reference.shape == thumbnail.shape
+                and now - self._reference_time < self.refresh_interval_s):
+            difference = cv2.absdiff(thumbnail, self._reference).reshape(thumbnail.shape[0], -1)
+            changed = cv2.countNonZero(cv2.threshold(difference, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1])
+            if changed < self.min_changed_values:
+                self.frames_skipped += 1
+                return False
+
+        self._reference = thumbnail
+        self._reference_time = now
+        self.frames_passed += 1
+        return True
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "skipped": self.frames_skipped,
+            "passed": self.frames_passed,
+        }
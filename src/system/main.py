@@ -1,145 +1,203 @@
-import cv2
-from system.camera import CameraProcessor
-from system.control import RobotNavigationFSM, RobotAction
+from system.camera import CameraProcessor, RobotMarkers
+from system.calibration import CameraCalibration
+from system.control import RobotNavigationFSM
 from system.broker import CommandSender
-from common.command import Command
+from system.capture import FrameGrabber
+from system.pipeline import InlineVisionPipeline, MultiProcessVisionPipeline
+from system.estimation import PoseEstimator
+from system.fleet import RobotChannel
+from system.dispatch import CommandDispatcher
+from system.overlay import OverlayRenderer, WindowSink, MjpegSink
+from system.runtime import ControlRuntime
+from system.adaptation import HsvRangeAdapter
+from system.resolution import ResolutionController
+from system.gating import MotionGate
+from common.metrics import format_summary
+from common.logged import configure_logger
+from loguru import logger
+import asyncio
 import time
 
-def run_camera_processing():
-    FSM_ANGLE_TOLERANCE_DEG = 25.0
-    FSM_STRAIGHT_MOVE_ANGLE_THRESHOLD_DEG = 30.0
-    FSM_DISTANCE_TOLERANCE_PX = 50.0
-    FSM_TURN_SPEED = 0.5
-    FSM_MOVE_SPEED = 1.0
-    
-    COMMAND_SEND_INTERVAL_S = 2.0
-
-    processor = CameraProcessor(debug=True, process_frame_width=640)
-    broker = CommandSender(host="192.168.1.104", port=1883) # 192.168.1.104
-    
-    fsm = RobotNavigationFSM(
+# --- Конфигурация ---
+ROBOTS = (
+    RobotMarkers(name="robot", front_color="pink", back_color="blue", target_color="green"),
+)
+ROBOT_COMMAND_TOPICS = {"robot": CommandSender.COMMAND_TOPIC}  # остальные роботы: robot/<name>/command
+CAMERA_CALIBRATION_PATH = None  # .npz с camera_matrix, dist_coeffs, image_size, floor_homography; None - расстояния в пикселях
+HSV_RANGES = None  # None - CameraProcessor.DEFAULT_HSV_RANGES; для нескольких роботов нужны диапазоны всех цветов
+HSV_ADAPTATION = False  # подстройка HSV диапазонов под освещение в фоновом потоке (только при PIPELINE_WORKERS = 0)
+
+FSM_ANGLE_TOLERANCE_DEG = 25.0
+FSM_STRAIGHT_MOVE_ANGLE_THRESHOLD_DEG = 30.0
+FSM_DISTANCE_TOLERANCE_PX = 50.0
+FSM_DISTANCE_TOLERANCE_CM = 10.0  # используется вместо FSM_DISTANCE_TOLERANCE_PX при заданной калибровке
+FSM_FULL_SPEED_DISTANCE_CM = 40.0
+FSM_TURN_SPEED = 0.5
+FSM_MOVE_SPEED = 1.0
+
+PROPORTIONAL_CONTROL = True  # False - прежние импульсы полной мощности по DEFAULT_ACTION_DURATION_S
+DRIVE_COMMAND_DURATION_S = 0.3  # робот остановится сам, если за это время не придёт новая команда
+DRIVE_STEERING_GAIN_PER_DEG = 0.01
+
+COMMAND_SEND_INTERVAL_S = 2.0  # повтор неизменной команды в импульсном режиме
+DRIVE_KEEPALIVE_INTERVAL_S = 0.1  # повтор неизменной команды DRIVE, должен быть меньше DRIVE_COMMAND_DURATION_S
+COMMAND_KEEPALIVE_BURST = 1
+CONTROL_RATE_HZ = 20.0
+STATUS_RATE_HZ = 2.0  # частота вывода строки состояния в консоль
+LOG_LEVEL = "INFO"
+LOG_ENQUEUE = True  # запись логов в фоновом потоке, вне цикла обработки кадров
+RECORD_DUMP_PATH = "runtime_records.jsonl"  # kill -USR1 <pid> сохраняет последние записи о кадрах и командах
+HEARTBEAT_RATE_HZ = 4.0  # должна быть заметно выше 1 / COMMAND_WATCHDOG_TIMEOUT_S робота
+HEARTBEAT_LIVENESS_S = 0.5  # heartbeat не отправляется, если дольше этого не было свежего кадра или такта управления; меньше COMMAND_WATCHDOG_TIMEOUT_S робота
+ESTIMATOR_MAX_GAP_S = 0.5
+ACTUATION_LATENCY_S = 0.05
+PROFILE_PIPELINE = False
+PROCESS_FRAME_WIDTH = 640
+ADAPTIVE_RESOLUTION_WIDTHS = None  # например (320, 480, 640): ширина обработки подбирается под TARGET_PROCESSING_FPS
+TARGET_PROCESSING_FPS = 30.0
+PYRAMID_REFINE = False  # уточнение маркеров в полном разрешении вокруг найденных на уменьшенном кадре
+MOTION_GATING = True  # пока все роботы стоят (IDLE, GOAL_REACHED), кадры без изменений не обрабатываются заново
+MOTION_GATE_REFRESH_S = 1.0  # полная обработка не реже этого интервала
+BLOB_METHOD = "contours"  # "components" - выделение маркера через connectedComponentsWithStats, см. check/benchmark.py --compare-blob-methods
+CAMERA_SOURCE = 0
+PIPELINE_WORKERS = 0  # 0 - всё в одном процессе, N > 0 - захват и N процессов обработки
+PIPELINE_FRAME_SHAPE = (480, 640, 3)
+DEBUG_VIEW = "window"  # "window", "mjpeg" или None
+MJPEG_HOST = "127.0.0.1"  # "0.0.0.0" - открыть поток без авторизации для всей сети
+MJPEG_PORT = 8080
+# --------------------
+
+def build_fsm(units: str = "px") -> RobotNavigationFSM:
+    if units == "cm":
+        distance_options = dict(distance_tolerance=FSM_DISTANCE_TOLERANCE_CM, full_speed_distance=FSM_FULL_SPEED_DISTANCE_CM)
+    else:
+        distance_options = dict(distance_tolerance=FSM_DISTANCE_TOLERANCE_PX)
+    return RobotNavigationFSM(
         angle_tolerance=FSM_ANGLE_TOLERANCE_DEG,
-        distance_tolerance=FSM_DISTANCE_TOLERANCE_PX,
         turn_speed=FSM_TURN_SPEED,
         move_speed=FSM_MOVE_SPEED,
-        straight_angle_threshold=FSM_STRAIGHT_MOVE_ANGLE_THRESHOLD_DEG
+        straight_angle_threshold=FSM_STRAIGHT_MOVE_ANGLE_THRESHOLD_DEG,
+        proportional=PROPORTIONAL_CONTROL,
+        **distance_options
     )
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+def build_dispatcher() -> CommandDispatcher:
+    keepalive_interval_s = DRIVE_KEEPALIVE_INTERVAL_S if PROPORTIONAL_CONTROL else COMMAND_SEND_INTERVAL_S
+    return CommandDispatcher(keepalive_interval_s=keepalive_interval_s, burst=COMMAND_KEEPALIVE_BURST)
+
+def load_calibration() -> CameraCalibration | None:
+    if CAMERA_CALIBRATION_PATH is None:
+        return None
+    return CameraCalibration.load(CAMERA_CALIBRATION_PATH)
+
+def build_fleet(units: str = "px") -> list[RobotChannel]:
+    return [
+        RobotChannel(name=robot.name,
+                     topic=ROBOT_COMMAND_TOPICS.get(robot.name, CommandSender.robot_topic(robot.name)),
+                     fsm=build_fsm(units),
+                     estimator=PoseEstimator(max_gap_s=ESTIMATOR_MAX_GAP_S, actuation_latency_s=ACTUATION_LATENCY_S,
+                                             units=units),
+                     dispatcher=build_dispatcher(),
+                     drive_command_duration_s=DRIVE_COMMAND_DURATION_S if PROPORTIONAL_CONTROL else None,
+                     steering_gain_per_deg=DRIVE_STEERING_GAIN_PER_DEG)
+        for robot in ROBOTS
+    ]
+
+def build_overlay_renderer() -> OverlayRenderer | None:
+    if DEBUG_VIEW == "window":
+        return OverlayRenderer(WindowSink())
+    if DEBUG_VIEW == "mjpeg":
+        return OverlayRenderer(MjpegSink(host=MJPEG_HOST, port=MJPEG_PORT))
+    return None
+
+def build_resolution_controller() -> ResolutionController | None:
+    if ADAPTIVE_RESOLUTION_WIDTHS is None:
+        return None
+    return ResolutionController(widths=ADAPTIVE_RESOLUTION_WIDTHS, target_fps=TARGET_PROCESSING_FPS)
+
+def build_vision_pipeline(calibration: CameraCalibration | None = None):
+    processor_kwargs = dict(debug=True, process_frame_width=PROCESS_FRAME_WIDTH, tracking=True, profile=PROFILE_PIPELINE,
+                            initial_hsv_ranges=HSV_RANGES, robots=ROBOTS, calibration=calibration,
+                            blob_method=BLOB_METHOD, resolution_controller=build_resolution_controller(),
+                            pyramid_refine=PYRAMID_REFINE,
+                            motion_gate=MotionGate(refresh_interval_s=MOTION_GATE_REFRESH_S) if MOTION_GATING else None)
+    if PIPELINE_WORKERS > 0:
+        return MultiProcessVisionPipeline(source=CAMERA_SOURCE,
+                                          worker_count=PIPELINE_WORKERS,
+                                          frame_shape=PIPELINE_FRAME_SHAPE,
+                                          processor_kwargs=processor_kwargs,
+                                          keep_frames=DEBUG_VIEW is not None)
+    return InlineVisionPipeline(FrameGrabber(source=CAMERA_SOURCE), CameraProcessor(**processor_kwargs))
+
+def run_camera_processing():
+    configure_logger(level=LOG_LEVEL, enqueue=LOG_ENQUEUE)
+    broker = CommandSender(host="192.168.1.104", port=1883) # 192.168.1.104
+    
+    calibration = load_calibration()
+    fleet = build_fleet("cm" if calibration is not None else "px")
+
+    vision = build_vision_pipeline(calibration)
+    processor = vision.processor
+    if not vision.start():
         print("Ошибка: Не удалось открыть веб-камеру.")
         return
 
     if not broker.connect():
         print("Ошибка: Не удалось подключиться к MQTT брокеру.")
-        cap.release()
-        cv2.destroyAllWindows()
+        vision.stop()
         return
 
-    target_is_known = False
-    last_command_send_time = 0.0
-    last_actually_sent_command_to_robot: Command | None = None
-
-
+    renderer = build_overlay_renderer()
+    if renderer is not None:
+        renderer.start()
+
+    adapter = None
+    if HSV_ADAPTATION and processor is not None:
+        adapter = HsvRangeAdapter(processor)
+        adapter.start()
+    elif HSV_ADAPTATION:
+        logger.warning("HSV adaptation needs the inline pipeline (PIPELINE_WORKERS = 0), disabled")
+
+    runtime = ControlRuntime(vision, fleet, broker, renderer,
+                             control_rate_hz=CONTROL_RATE_HZ, status_rate_hz=STATUS_RATE_HZ,
+                             heartbeat_rate_hz=HEARTBEAT_RATE_HZ,
+                             heartbeat_liveness_s=HEARTBEAT_LIVENESS_S, record_dump_path=RECORD_DUMP_PATH,
+                             adapter=adapter)
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Ошибка: Не удалось получить кадр с веб-камеры.")
-                break
-
-            results = processor.get_processing_results(frame)
-            distance_px = results.get("distance_px")
-            angle_deg = results.get("angle_to_target_deg")
-
-            robot_action_fsm: RobotAction | None = None
-
-            if distance_px is not None and angle_deg is not None:
-                if not target_is_known:
-                    fsm.set_target(angle_deg, distance_px)
-                    target_is_known = True
-                robot_action_fsm = fsm.update(angle_deg, distance_px)
-            else:
-                if target_is_known:
-                    fsm.clear_target()
-                    target_is_known = False
-                robot_action_fsm = fsm.update(0.0, 0.0)
-
-            current_desired_command_for_robot: Command | None = None
-            if robot_action_fsm:
-                action_cmd_str = robot_action_fsm.command
-                if action_cmd_str == "idle":
-                    current_desired_command_for_robot = Command.STOP 
-                elif action_cmd_str == "turn_right":
-                    current_desired_command_for_robot = Command.TURN_RIGHT
-                elif action_cmd_str == "turn_left":
-                    current_desired_command_for_robot = Command.TURN_LEFT
-                elif action_cmd_str == "move_forward":
-                    current_desired_command_for_robot = Command.MOVE_FORWARD
-                elif action_cmd_str == "stop":
-                    current_desired_command_for_robot = Command.STOP
-            
-            current_time = time.time()
-            should_send_mqtt_command_now = False
-            
-            if current_desired_command_for_robot:
-                is_urgent_stop_request = (current_desired_command_for_robot == Command.STOP and \
-                                          last_actually_sent_command_to_robot != Command.STOP)
-
-                time_since_last_send = current_time - last_command_send_time
-                interval_elapsed = (time_since_last_send >= COMMAND_SEND_INTERVAL_S)
-
-                command_changed = (current_desired_command_for_robot != last_actually_sent_command_to_robot)
-
-                if is_urgent_stop_request:
-                    should_send_mqtt_command_now = True
-                elif interval_elapsed:
-                    if command_changed:
-                        should_send_mqtt_command_now = True
-                    elif current_desired_command_for_robot != Command.STOP:
-                         should_send_mqtt_command_now = True
-            
-            actual_mqtt_payload_sent_str = "No MQTT Cmd This Frame"
-
-            if should_send_mqtt_command_now and current_desired_command_for_robot:
-                if broker.send(current_desired_command_for_robot):
-                    last_command_send_time = current_time
-                    last_actually_sent_command_to_robot = current_desired_command_for_robot
-                    actual_mqtt_payload_sent_str = current_desired_command_for_robot.value
-                else:
-                    actual_mqtt_payload_sent_str = "MQTT Send FAIL"
-            elif current_desired_command_for_robot:
-                 actual_mqtt_payload_sent_str = f"Throttled ({current_desired_command_for_robot.value})"
-
-            dist_str = f"{distance_px:.1f} px" if distance_px is not None else "N/A"
-            angle_str = f"{angle_deg:.1f} deg" if angle_deg is not None else "N/A"
-            fsm_action_str = robot_action_fsm.command if robot_action_fsm else "N/A"
-            
-            print(f"Dist: {dist_str}, Angle: {angle_str}, FSM State: {fsm.get_current_state_name()}, "
-                  f"FSM Action: {fsm_action_str}, Desired MQTT: {current_desired_command_for_robot.value if current_desired_command_for_robot else 'None'}, "
-                  f"SentToMQTT: {actual_mqtt_payload_sent_str}, LastSentToRobot: {last_actually_sent_command_to_robot.value if last_actually_sent_command_to_robot else 'None'}")
-
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                break
-    
+        asyncio.run(runtime.run())
+    except KeyboardInterrupt:
+        pass
     finally:
         print("Exiting program...")
-        if broker.connected:
-            print("Sending final STOP command to robot...")
-            broker.send(Command.STOP) 
-            broker.disconnect()
+        broker.disconnect()
         
-        cap.release()
-        if processor.debug_mode:
+        vision.stop()
+        if renderer is not None:
+            renderer.stop()
+        if adapter is not None:
+            adapter.stop()
+        print(f"Статистика захвата: {vision.get_stats()}")
+        for channel in fleet:
+            print(f"Статистика команд [{channel.name}]: {channel.dispatcher.get_stats(time.monotonic())}")
+        print(f"Статистика MQTT: {broker.get_stats()}")
+        for line in format_summary({"mqtt_publish": broker.publish_latency.summary()}):
+            print(f"    {line}")
+        if processor is not None and processor.motion_gate is not None:
+            print(f"Пропуск неизменных кадров: {processor.motion_gate.get_stats()}")
+        if processor is not None and processor.resolution_controller is not None:
+            print(f"Разрешение обработки: {processor.resolution_controller.get_stats()}")
+        if processor is not None and processor.profiler.enabled:
+            print("\nВремя стадий обработки кадра:")
+            for line in format_summary(processor.get_profile_summary()):
+                print(f"    {line}")
+        if processor is not None and processor.debug_mode:
             final_hsv = processor.get_current_hsv_ranges()
             print("\nИтоговые HSV диапазоны (если debug=True):")
             for color_name, values in final_hsv.items():
                 print(f'    "{color_name}": [{values[0]}, {values[1]}, {values[2]}, {values[3]}, {values[4]}, {values[5]}],')
-            processor.release_windows()
 
-        cv2.destroyAllWindows()
         print("Веб-камера освобождена, MQTT отключен, окна закрыты.")
+        logger.complete()
 
 if __name__ == "__main__":
     run_camera_processing()
@@ -0,0 +1,235 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from common.logged import LoggedClass
+
+
+def _draw_robot(output_img: np.ndarray, robot: dict) -> None:
+    centroid_front = robot.get("front_uv")
+    centroid_back = robot.get("back_uv")
+    centroid_target = robot.get("target_center_uv")
+    robot_center = robot.get("robot_center_uv")
+
+    if centroid_front:
+        cv2.circle(output_img, centroid_front, 5, (203, 192, 255), -1)
+    if centroid_back:
+        cv2.circle(output_img, centroid_back, 5, (255, 192, 203), -1)
+    if centroid_front and centroid_back:
+        cv2.line(output_img, centroid_front, centroid_back, (255, 0, 255), 2)
+    if robot_center:
+        cv2.circle(output_img, robot_center, 5, (255, 255, 0), -1)
+    if centroid_target:
+        cv2.circle(output_img, centroid_target, 5, (0, 255, 0), -1)
+
+    distance_to_target = robot.get("distance_px")
+    angle_to_target_deg = robot.get("angle_to_target_deg")
+    if robot_center and centroid_target and distance_to_target is not None:
+        cv2.line(output_img, robot_center, centroid_target, (0, 255, 255), 2)
+
+        mid_line_x = (robot_center[0] + centroid_target[0]) // 2
+        mid_line_y = (robot_center[1] + centroid_target[1]) // 2
+
+        distance_cm = robot.get("distance_cm")
+        if distance_cm is not None:
+            dist_text = f"Dist: {distance_cm:.0f}cm"
+        else:
+            dist_text = f"Dist: {distance_to_target:.0f}px"
+        angle_text = f"Angle: {angle_to_target_deg:.0f}deg"
+
+        font_scale = 0.5
+        thickness = 1
+        for text, origin in ((dist_text, (mid_line_x + 5, mid_line_y - 5)),
+                             (angle_text, (mid_line_x + 5, mid_line_y + 15))):
+            cv2.putText(output_img, text, origin,
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness + 1, cv2.LINE_AA)
+            cv2.putText(output_img, text, origin,
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
+
+
+def draw_overlay(frame: np.ndarray, results: dict) -> np.ndarray:
+    """
+    Draws the markers, axis and target line of every robot described by a
+    CameraProcessor results dict onto a copy of the frame, scaled to the
+    resolution the results were computed at.
+    """
+    scale_ratio = results.get("scale_ratio", 1.0)
+    if scale_ratio != 1.0:
+        width = int(round(frame.shape[1] * scale_ratio))
+        height = int(frame.shape[0] * scale_ratio)
+        output_img = cv2.resize(frame, (width, height), interpolation=cv2.INTER_LINEAR)
+    else:
+        output_img = frame.copy()
+
+    for robot in results.get("robots", {}).values():
+        _draw_robot(output_img, robot)
+
+    return output_img
+
+
+class WindowSink:
+    OUTPUT_WINDOW_NAME = "Camera Debug Output"
+
+    def __init__(self):
+        self.quit_requested = False
+        self._window_created = False
+
+    def show(self, image: np.ndarray) -> None:
+        if not self._window_created:
+            cv2.namedWindow(self.OUTPUT_WINDOW_NAME, cv2.WINDOW_NORMAL)
+            cv2.resizeWindow(self.OUTPUT_WINDOW_NAME, 960, 720)
+            self._window_created = True
+        cv2.imshow(self.OUTPUT_WINDOW_NAME, image)
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            self.quit_requested = True
+
+    def close(self) -> None:
+        if self._window_created:
+            cv2.destroyWindow(self.OUTPUT_WINDOW_NAME)
+            self._window_created = False
+
+
+class MjpegSink(LoggedClass):
+    """
+    Serves the overlay as an MJPEG stream (multipart/x-mixed-replace) over HTTP,
+    for hosts without a display. Open http://<host>:<port>/ in a browser.
+    The stream has no authentication, so it only listens on localhost unless
+    another host (e.g. "0.0.0.0") is passed explicitly.
+    """
+    BOUNDARY = "frame"
+    DEFAULT_HOST = "127.0.0.1"
+    DEFAULT_PORT = 8080
+    DEFAULT_JPEG_QUALITY = 70
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, jpeg_quality: int = DEFAULT_JPEG_QUALITY):
+        super().__init__()
+        self.quit_requested = False
+        self.jpeg_quality = jpeg_quality
+        self._jpeg: bytes | None = None
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._clients = 0
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mjpeg-server", daemon=True)
+        self._thread.start()
+        self.logger.success(f"MJPEG stream at http://{host}:{port}/")
+
+    def _make_handler(self):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={sink.BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                with sink._condition:
+                    sink._clients += 1
+                try:
+                    last_sequence = 0
+                    while True:
+                        with sink._condition:
+                            sink._condition.wait_for(lambda: sink._closed or sink._sequence > last_sequence)
+                            if sink._closed:
+                                return
+                            jpeg, last_sequence = sink._jpeg, sink._sequence
+                        self.wfile.write(f"--{sink.BOUNDARY}\r\n".encode())
+                        self.wfile.write(b"Content-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with sink._condition:
+                        sink._clients -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def show(self, image: np.ndarray) -> None:
+        if not self._clients:
+            return
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            return
+        with self._condition:
+            self._jpeg = encoded.tobytes()
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class OverlayRenderer(LoggedClass):
+    """
+    Builds the debug overlay on its own thread from the latest submitted frame
+    and results. submit() only swaps a reference, and frames submitted while
+    the renderer is busy are skipped.
+    """
+
+    def __init__(self, sink):
+        super().__init__()
+        self.sink = sink
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+
+        self._pending: tuple[np.ndarray, dict] | None = None
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def quit_requested(self) -> bool:
+        return self.sink.quit_requested
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._render_loop, name="overlay-renderer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.logger.info(f"Overlay renderer stopped: rendered {self.frames_rendered}, skipped {self.frames_skipped}")
+
+    def submit(self, frame: np.ndarray, results: dict) -> None:
+        with self._condition:
+            if self._pending is not None:
+                self.frames_skipped += 1
+            self._pending = (frame, results)
+            self._condition.notify()
+
+    def _render_loop(self) -> None:
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: not self._running or self._pending is not None)
+                    if not self._running:
+                        return
+                    frame, results = self._pending
+                    self._pending = None
+                try:
+                    self.sink.show(draw_overlay(frame, results))
+                    self.frames_rendered += 1
+                except Exception as e:
+                    self.logger.error(f"Overlay rendering failed: {e}")
+        finally:
+            self.sink.close()
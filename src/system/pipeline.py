@@ -0,0 +1,308 @@
+import heapq
+import multiprocessing as mp
+import os
+import queue
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from loguru import logger
+
+from common.logged import LoggedClass, ThrottledLogger
+from system.camera import CameraProcessor
+from system.capture import FrameGrabber
+
+
+@dataclass
+class ProcessedFrame:
+    index: int
+    timestamp: float
+    results: dict
+    image: np.ndarray | None = None
+
+
+class SharedFrameRing:
+    """
+    A fixed number of frame-sized slots in one shared memory block. Processes
+    exchange slot indices instead of pickling the frames themselves.
+    """
+
+    def __init__(self, slot_count: int, frame_shape: tuple[int, int, int], name: str | None = None):
+        self.slot_count = slot_count
+        self.frame_shape = tuple(frame_shape)
+        self.slot_size = int(np.prod(self.frame_shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_size * slot_count)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def slot(self, index: int) -> np.ndarray:
+        return np.ndarray(self.frame_shape, dtype=np.uint8, buffer=self.shm.buf, offset=index * self.slot_size)
+
+    def close(self) -> None:
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+
+
+def _capture_worker(source, ring_name, slot_count, frame_shape, free_slots, tasks, stop_event, stats):
+    ring = SharedFrameRing(slot_count, frame_shape, name=ring_name)
+    cap = cv2.VideoCapture(source)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, frame_shape[1])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_shape[0])
+    index = 0
+    try:
+        while not stop_event.is_set():
+            ret, image = cap.read()
+            timestamp = time.monotonic()
+            if not ret:
+                break
+            try:
+                slot = free_slots.get_nowait()
+            except queue.Empty:
+                # Every slot is still being processed: drop the frame instead of queueing it
+                with stats.get_lock():
+                    stats[1] += 1
+                continue
+            if image.shape != ring.frame_shape:
+                image = cv2.resize(image, (frame_shape[1], frame_shape[0]), interpolation=cv2.INTER_AREA)
+            ring.slot(slot)[:] = image
+            tasks.put((index, slot, timestamp))
+            index += 1
+            with stats.get_lock():
+                stats[0] += 1
+    finally:
+        cap.release()
+        ring.close()
+        stop_event.set()
+
+
+def _processing_worker(ring_name, slot_count, frame_shape, processor_kwargs, tasks, results_queue, motion_gating):
+    ring = SharedFrameRing(slot_count, frame_shape, name=ring_name)
+    processor = CameraProcessor(**processor_kwargs)
+    worker_logger = ThrottledLogger(logger.bind(classname=mp.current_process().name))
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            index, slot, timestamp = task
+            if processor.motion_gate is not None:
+                processor.motion_gate.enabled = bool(motion_gating.value)
+            try:
+                results = processor.get_processing_results(ring.slot(slot))
+            except Exception as e:
+                # the frame's index must still reach the reorder heap, or read() waits for it forever
+                worker_logger.log("ERROR", "process", "Processing of frame {} failed: {!r}", index, e)
+                results = {"error": repr(e)}
+            results_queue.put((index, slot, timestamp, results))
+    finally:
+        ring.close()
+
+
+class InlineVisionPipeline(LoggedClass):
+    """
+    Single-process pipeline: background capture thread, processing on the
+    calling thread. Same interface as MultiProcessVisionPipeline, including
+    the "error" results of frames whose processing raised.
+    """
+
+    def __init__(self, grabber: FrameGrabber, processor: CameraProcessor):
+        super().__init__()
+        self.grabber = grabber
+        self.processor = processor
+        self._throttled = ThrottledLogger(self.logger)
+        self.frames_failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self.grabber.running
+
+    def start(self) -> bool:
+        return self.grabber.start()
+
+    def read(self, timeout: float | None = None) -> ProcessedFrame | None:
+        captured = self.grabber.read(timeout=timeout)
+        if captured is None:
+            return None
+        try:
+            results = self.processor.get_processing_results(captured.image)
+        except Exception as e:
+            self._throttled.log("ERROR", "process", "Processing of frame {} failed: {!r}", captured.index, e)
+            results = {"error": repr(e)}
+            self.frames_failed += 1
+        return ProcessedFrame(index=captured.index, timestamp=captured.timestamp, results=results, image=captured.image)
+
+    def set_motion_gating(self, enabled: bool) -> None:
+        if self.processor.motion_gate is not None:
+            self.processor.motion_gate.enabled = enabled
+
+    def stop(self) -> None:
+        self.grabber.stop()
+
+    def get_stats(self) -> dict:
+        return dict(self.grabber.get_stats(), failed=self.frames_failed)
+
+
+class MultiProcessVisionPipeline(LoggedClass):
+    """
+    Capture and processing run in separate processes. Frames are written once
+    into a SharedFrameRing; workers receive slot indices and return only the
+    results dict. A slot is reused only after its result has been merged, so
+    a full ring drops new camera frames instead of building a backlog, and
+    results are handed out strictly in capture order.
+
+    Workers process whole frames in parallel, so ROI tracking (which needs the
+    previous frame's result) is disabled inside them. A frame whose processing
+    raises is still handed out, with only an "error" entry in its results. If
+    a capture or worker process dies, its frames can never be handed out, so
+    the pipeline stops: read() returns None and running turns False.
+    """
+    DEFAULT_FRAME_SHAPE = (480, 640, 3)
+    PROCESS_CHECK_INTERVAL_S = 0.5
+
+    def __init__(self,
+                 source=0,
+                 worker_count: int | None = None,
+                 frame_shape: tuple[int, int, int] = DEFAULT_FRAME_SHAPE,
+                 processor_kwargs: dict | None = None,
+                 keep_frames: bool = False):
+        super().__init__()
+        self.source = source
+        self.worker_count = worker_count or max(1, (os.cpu_count() or 2) - 2)
+        self.frame_shape = frame_shape
+        self.processor_kwargs = dict(processor_kwargs or {})
+        self.processor_kwargs["tracking"] = False
+        self.processor_kwargs["debug"] = False
+        self.keep_frames = keep_frames
+        self.processor = None
+
+        self._context = mp.get_context("spawn")
+        self._ring: SharedFrameRing | None = None
+        self._processes: list = []
+        self._reorder_heap: list = []
+        self._next_index = 0
+        self._stop_event = None
+        self._capture_stats = None
+        self._motion_gating = None
+
+        self.frames_processed = 0
+        self.frames_failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._stop_event is not None and not self._stop_event.is_set() and not self._dead_processes()
+
+    def _dead_processes(self) -> list:
+        return [process for process in self._processes if not process.is_alive()]
+
+    def _check_processes(self) -> bool:
+        """
+        Stops the pipeline if a capture or worker process has died; returns
+        False in that case.
+        """
+        dead = self._dead_processes()
+        if not dead:
+            return True
+        if not self._stop_event.is_set():
+            self.logger.error("Vision pipeline stopped, processes died: "
+                              + ", ".join(f"{process.name} (exit code {process.exitcode})" for process in dead))
+            self._stop_event.set()
+        return False
+
+    def start(self) -> bool:
+        slot_count = 2 * self.worker_count + 1
+        self._ring = SharedFrameRing(slot_count, self.frame_shape)
+
+        ctx = self._context
+        self._free_slots = ctx.Queue()
+        for slot in range(slot_count):
+            self._free_slots.put(slot)
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._stop_event = ctx.Event()
+        self._capture_stats = ctx.Array("q", 2)
+        self._motion_gating = ctx.Value("b", 0, lock=False)
+
+        capture = ctx.Process(
+            target=_capture_worker, name="vision-capture", daemon=True,
+            args=(self.source, self._ring.name, slot_count, self.frame_shape,
+                  self._free_slots, self._tasks, self._stop_event, self._capture_stats))
+        self._processes.append(capture)
+        for i in range(self.worker_count):
+            self._processes.append(ctx.Process(
+                target=_processing_worker, name=f"vision-worker-{i}", daemon=True,
+                args=(self._ring.name, slot_count, self.frame_shape, self.processor_kwargs,
+                      self._tasks, self._results, self._motion_gating)))
+        for process in self._processes:
+            process.start()
+
+        self.logger.success(f"Vision pipeline started: {self.worker_count} workers, {slot_count} frame slots")
+        return True
+
+    def read(self, timeout: float | None = None) -> ProcessedFrame | None:
+        """
+        Returns the next result in capture order, or None if it did not arrive
+        within the timeout or a pipeline process has died.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._reorder_heap or self._reorder_heap[0][0] != self._next_index:
+            remaining = self.PROCESS_CHECK_INTERVAL_S
+            if deadline is not None:
+                remaining = min(remaining, max(0.0, deadline - time.monotonic()))
+            try:
+                heapq.heappush(self._reorder_heap, self._results.get(timeout=remaining))
+            except queue.Empty:
+                if not self._check_processes():
+                    return None
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+
+        index, slot, timestamp, results = heapq.heappop(self._reorder_heap)
+        image = self._ring.slot(slot).copy() if self.keep_frames else None
+        self._free_slots.put(slot)
+        self._next_index += 1
+        self.frames_processed += 1
+        if "error" in results:
+            self.frames_failed += 1
+        return ProcessedFrame(index=index, timestamp=timestamp, results=results, image=image)
+
+    def set_motion_gating(self, enabled: bool) -> None:
+        """
+        Turns the workers' motion gates on or off from their next frame.
+        """
+        if self._motion_gating is not None:
+            self._motion_gating.value = int(enabled)
+
+    def stop(self) -> None:
+        if self._stop_event is None:
+            return
+        self._stop_event.set()
+        for _ in range(self.worker_count):
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+        self._ring.close()
+        self._ring.unlink()
+        self.logger.info(f"Vision pipeline stopped: {self.get_stats()}")
+
+    def get_stats(self) -> dict:
+        captured, dropped = self._capture_stats[:] if self._capture_stats is not None else (0, 0)
+        return {
+            "captured": captured,
+            "dropped": dropped,
+            "processed": self.frames_processed,
+            "failed": self.frames_failed,
+        }
@@ -0,0 +1,85 @@
+import csv
+import os
+
+import cv2
+
+from common.logged import LoggedClass
+from system.capture import CapturedFrame
+
+
+class SessionRecorder(LoggedClass):
+    """
+    Saves raw frames as lossless PNG files together with their capture
+    timestamps, so an arena session can be replayed without a camera.
+    """
+    FRAMES_DIR = "frames"
+    INDEX_FILE = "timestamps.csv"
+
+    def __init__(self, session_dir: str):
+        super().__init__()
+        self.session_dir = session_dir
+        self._frames_dir = os.path.join(session_dir, self.FRAMES_DIR)
+        self._index_file = None
+        self._index_writer = None
+        self.frames_written = 0
+
+    def open(self) -> None:
+        os.makedirs(self._frames_dir, exist_ok=True)
+        self._index_file = open(os.path.join(self.session_dir, self.INDEX_FILE), "w", newline="")
+        self._index_writer = csv.writer(self._index_file)
+        self._index_writer.writerow(["index", "timestamp", "filename"])
+        self.logger.info(f"Recording session to {self.session_dir}")
+
+    def write(self, frame: CapturedFrame) -> None:
+        filename = f"{self.frames_written:06d}.png"
+        cv2.imwrite(os.path.join(self._frames_dir, filename), frame.image)
+        self._index_writer.writerow([self.frames_written, f"{frame.timestamp:.6f}", filename])
+        self.frames_written += 1
+
+    def close(self) -> None:
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        self.logger.success(f"Recorded {self.frames_written} frames to {self.session_dir}")
+
+
+class SessionReplaySource:
+    """
+    Reads a session written by SessionRecorder. Implements the subset of the
+    cv2.VideoCapture interface used by FrameGrabber, so a recording can stand
+    in for the webcam.
+    """
+
+    def __init__(self, session_dir: str):
+        self.session_dir = session_dir
+        self.entries: list[tuple[int, float, str]] = []
+        index_path = os.path.join(session_dir, SessionRecorder.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, newline="") as index_file:
+                for row in csv.DictReader(index_file):
+                    self.entries.append((int(row["index"]), float(row["timestamp"]), row["filename"]))
+        self._position = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def isOpened(self) -> bool:
+        return bool(self.entries)
+
+    def _load(self, filename: str):
+        return cv2.imread(os.path.join(self.session_dir, SessionRecorder.FRAMES_DIR, filename), cv2.IMREAD_COLOR)
+
+    def read(self):
+        if self._position >= len(self.entries):
+            return False, None
+        _, _, filename = self.entries[self._position]
+        self._position += 1
+        image = self._load(filename)
+        return image is not None, image
+
+    def release(self) -> None:
+        self._position = len(self.entries)
+
+    def load_all(self) -> list[CapturedFrame]:
+        return [CapturedFrame(image=self._load(filename), index=index, timestamp=timestamp)
+                for index, timestamp, filename in self.entries]
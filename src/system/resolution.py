@@ -0,0 +1,71 @@
+class ResolutionController:
+    """
+    Chooses the processing width from a few preset widths so that frame
+    processing fits the budget of target_fps. The processing time is
+    smoothed; the width steps down when the smoothed time exceeds the budget
+    and steps up when the time predicted for the next width (cost grows with
+    the pixel count) stays under headroom * budget. After a change the width
+    is held for hold_frames frames, so one slow frame does not make it flap.
+    """
+    DEFAULT_WIDTHS = (320, 480, 640)
+    DEFAULT_TARGET_FPS = 30.0
+    DEFAULT_HEADROOM = 0.7
+    DEFAULT_HOLD_FRAMES = 15
+    TIME_SMOOTHING = 0.2
+
+    def __init__(self,
+                 widths: tuple[int, ...] = DEFAULT_WIDTHS,
+                 target_fps: float = DEFAULT_TARGET_FPS,
+                 headroom: float = DEFAULT_HEADROOM,
+                 hold_frames: int = DEFAULT_HOLD_FRAMES):
+        if not widths:
+            raise ValueError("At least one processing width is required")
+        self.widths = tuple(sorted(widths))
+        self.budget_s = 1.0 / target_fps
+        self.headroom = headroom
+        self.hold_frames = hold_frames
+
+        self._index = len(self.widths) - 1
+        self._smoothed_time_s: float | None = None
+        self._frames_since_change = 0
+        self.changes = 0
+
+    @property
+    def width(self) -> int:
+        return self.widths[self._index]
+
+    def _switch(self, index: int) -> None:
+        pixel_ratio = (self.widths[index] / self.width) ** 2
+        self._smoothed_time_s *= pixel_ratio
+        self._index = index
+        self._frames_since_change = 0
+        self.changes += 1
+
+    def record(self, processing_time_s: float) -> int:
+        """
+        Takes the processing time of the last frame and returns the width for
+        the next one.
+        """
+        if self._smoothed_time_s is None:
+            self._smoothed_time_s = processing_time_s
+        else:
+            self._smoothed_time_s += self.TIME_SMOOTHING * (processing_time_s - self._smoothed_time_s)
+        self._frames_since_change += 1
+        if self._frames_since_change < self.hold_frames:
+            return self.width
+
+        if self._smoothed_time_s > self.budget_s and self._index > 0:
+            self._switch(self._index - 1)
+        elif self._index < len(self.widths) - 1:
+            pixel_ratio = (self.widths[self._index + 1] / self.width) ** 2
+            if self._smoothed_time_s * pixel_ratio < self.headroom * self.budget_s:
+                self._switch(self._index + 1)
+        return self.width
+
+    def get_stats(self) -> dict:
+        return {
+            "width": self.width,
+            "changes": self.changes,
+            "smoothed_time_ms": self._smoothed_time_s * 1e3 if self._smoothed_time_s is not None else None,
+            "budget_ms": self.budget_s * 1e3,
+        }
@@ -0,0 +1,275 @@
+import asyncio
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from common.command import Command, CommandWithArguments
+from common.logged import LoggedClass
+from common.metrics import RecordRing
+from system.adaptation import HsvRangeAdapter
+from system.broker import CommandSender
+from system.fleet import RobotChannel, format_status
+from system.overlay import OverlayRenderer
+
+def put_latest(queue: asyncio.Queue, item) -> bool:
+    """
+    Puts item into a bounded queue, dropping the oldest entry when it is full.
+    Returns False if an entry was dropped.
+    """
+    dropped = False
+    if queue.full():
+        queue.get_nowait()
+        dropped = True
+    queue.put_nowait(item)
+    return not dropped
+
+class QueuedSender:
+    """
+    CommandSender stand-in for RobotChannel.control_step: send() only queues
+    the command for the publish task and never blocks the control tick. The
+    outcome reaches on_result later: the result of CommandSender.send(), or
+    False if the command was dropped from the queue. A full queue drops its
+    oldest command other than STOP; STOP is never dropped.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: deque[tuple] = deque()
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def send(self,
+             command: Command | CommandWithArguments,
+             topic: str | None = None,
+             on_result: Callable[[bool], None] | None = None) -> None:
+        if len(self._items) >= self.maxsize:
+            self._drop_oldest()
+        self._items.append((command, topic, on_result))
+        self._ready.set()
+
+    def _drop_oldest(self) -> None:
+        for i, (command, _, on_result) in enumerate(self._items):
+            if command != Command.STOP and getattr(command, "command", None) != Command.STOP:
+                del self._items[i]
+                self.dropped += 1
+                if on_result is not None:
+                    on_result(False)
+                return
+
+    async def get(self) -> tuple:
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._items.popleft()
+
+class ControlRuntime(LoggedClass):
+    """
+    Runs the system side as asyncio tasks linked by bounded queues:
+    - capture: blocking vision.read() (capture and processing) on its own executor thread;
+    - perception: feeds results to the robots' estimators, the overlay and the
+      HSV adapter;
+    - control: FSM ticks at control_rate_hz, commands go to the publish queue;
+      while every robot is at rest the vision pipeline may skip unchanged frames;
+    - publish: CommandSender.send() on a second executor thread;
+    - heartbeat: a HEARTBEAT to every robot at heartbeat_rate_hz, which keeps
+      the robot's command watchdog fed while no motion commands are sent. It
+      is only sent while a control tick ran and a frame captured without a
+      processing error arrived within heartbeat_liveness_s, so the robot
+      stops when capture, processing or control dies;
+    - status: logs the latest status lines at status_rate_hz.
+    A full queue drops its oldest entry, so a slow consumer never builds a
+    backlog or stalls its producer. A task that fails is logged and stops the
+    runtime, and on shutdown every robot gets a final STOP.
+
+    Every frame and control tick leaves a structured record in `records`;
+    SIGUSR1 dumps them to record_dump_path as JSON lines.
+    """
+    FRAME_QUEUE_SIZE = 2
+    PUBLISH_QUEUE_SIZE = 8
+    READ_TIMEOUT_S = 0.1
+
+    def __init__(self,
+                 vision,
+                 fleet: list[RobotChannel],
+                 broker: CommandSender,
+                 renderer: OverlayRenderer | None = None,
+                 control_rate_hz: float = 20.0,
+                 status_rate_hz: float = 2.0,
+                 heartbeat_rate_hz: float = 4.0,
+                 heartbeat_liveness_s: float = 0.5,
+                 record_capacity: int = 2000,
+                 record_dump_path: str = "runtime_records.jsonl",
+                 adapter: HsvRangeAdapter | None = None):
+        super().__init__()
+        self.vision = vision
+        self.fleet = fleet
+        self.broker = broker
+        self.renderer = renderer
+        self.adapter = adapter
+        self.control_period_s = 1.0 / control_rate_hz
+        self.status_period_s = 1.0 / status_rate_hz
+        self.heartbeat_period_s = 1.0 / heartbeat_rate_hz
+        self.heartbeat_liveness_s = heartbeat_liveness_s
+
+        self._stop_event: asyncio.Event | None = None
+        self._status_records: dict[str, dict] = {}
+        self.records = RecordRing(record_capacity)
+        self.record_dump_path = record_dump_path
+        self.frames_dropped = 0
+        self.control_overruns = 0
+        self._motion_gating = False
+        self._last_frame_time: float | None = None
+        self._last_control_time: float | None = None
+        self.heartbeats_withheld = 0
+
+    def request_stop(self) -> None:
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    def dump_records(self) -> None:
+        count = self.records.dump(self.record_dump_path)
+        self.logger.info(f"Dumped {count} runtime records to {self.record_dump_path}")
+
+    async def run(self) -> None:
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.dump_records)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            self.logger.warning("SIGUSR1 is not available, runtime records can only be dumped from code")
+        frames = asyncio.Queue(maxsize=self.FRAME_QUEUE_SIZE)
+        sender = QueuedSender(self.PUBLISH_QUEUE_SIZE)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="runtime-capture") as capture_executor, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="runtime-publish") as publish_executor:
+            tasks = [
+                asyncio.create_task(self._capture(frames, capture_executor), name="capture"),
+                asyncio.create_task(self._perception(frames), name="perception"),
+                asyncio.create_task(self._control(sender), name="control"),
+                asyncio.create_task(self._publish(sender, publish_executor), name="publish"),
+                asyncio.create_task(self._heartbeat(sender), name="heartbeat"),
+                asyncio.create_task(self._status(), name="status"),
+            ]
+            for task in tasks:
+                task.add_done_callback(self._on_task_done)
+            try:
+                await self._stop_event.wait()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self._send_final_stop()
+                self.logger.info(f"Runtime stopped: frames dropped {self.frames_dropped}, "
+                                 f"publish queue drops {sender.dropped}, control overruns {self.control_overruns}, "
+                                 f"heartbeats withheld {self.heartbeats_withheld}")
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+        self.logger.opt(exception=task.exception()).error(f"Runtime task {task.get_name()} failed, stopping")
+        self.request_stop()
+
+    def _send_final_stop(self) -> None:
+        if not self.broker.connected:
+            return
+        print("Sending final STOP command to robots...")
+        for channel in self.fleet:
+            self.broker.send(Command.STOP, topic=channel.topic)
+
+    async def _capture(self, frames: asyncio.Queue, executor: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            processed = await loop.run_in_executor(executor, self.vision.read, self.READ_TIMEOUT_S)
+            if processed is not None:
+                if not put_latest(frames, processed):
+                    self.frames_dropped += 1
+            elif not self.vision.running:
+                print("Ошибка: Не удалось получить кадр с веб-камеры.")
+                self.request_stop()
+                return
+
+    async def _perception(self, frames: asyncio.Queue) -> None:
+        while True:
+            processed = await frames.get()
+            if "error" not in processed.results:
+                self._last_frame_time = processed.timestamp
+            for channel in self.fleet:
+                channel.update(processed.results, processed.timestamp)
+            self.records.append({
+                "type": "frame",
+                "index": processed.index,
+                "capture_time": processed.timestamp,
+                "age_ms": (time.monotonic() - processed.timestamp) * 1e3,
+                "detection_path": processed.results.get("detection_path"),
+                "cached": processed.results.get("cached"),
+                "robots": {name: {"distance_px": robot.get("distance_px"),
+                                  "distance_cm": robot.get("distance_cm"),
+                                  "angle_deg": robot.get("angle_to_target_deg")}
+                           for name, robot in processed.results.get("robots", {}).items()},
+            })
+            if self.renderer is not None and processed.image is not None:
+                self.renderer.submit(processed.image, processed.results)
+            if self.adapter is not None and processed.image is not None:
+                self.adapter.submit(processed.image, processed.results)
+
+    async def _control(self, sender: QueuedSender) -> None:
+        next_tick = time.monotonic()
+        while True:
+            now = time.monotonic()
+            self._last_control_time = now
+            for channel in self.fleet:
+                record = channel.control_step(sender, now)
+                self._status_records[channel.name] = record
+                self.records.append(record)
+            at_rest = all(channel.fsm.at_rest for channel in self.fleet)
+            if at_rest != self._motion_gating:
+                self._motion_gating = at_rest
+                self.vision.set_motion_gating(at_rest)
+            if self.renderer is not None and self.renderer.quit_requested:
+                self.request_stop()
+                return
+
+            next_tick += self.control_period_s
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                self.control_overruns += 1
+                next_tick = time.monotonic()
+                delay = 0.0
+            await asyncio.sleep(delay)
+
+    async def _publish(self, sender: QueuedSender, executor: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            command, topic, on_result = await sender.get()
+            ok = await loop.run_in_executor(executor, lambda: self.broker.send(command, topic=topic))
+            if on_result is not None:
+                on_result(ok)
+
+    def _pipeline_alive(self, now: float) -> bool:
+        return all(last is not None and now - last <= self.heartbeat_liveness_s
+                   for last in (self._last_frame_time, self._last_control_time))
+
+    async def _heartbeat(self, sender: QueuedSender) -> None:
+        withholding = False
+        while True:
+            await asyncio.sleep(self.heartbeat_period_s)
+            if not self.broker.connected:
+                continue
+            if not self._pipeline_alive(time.monotonic()):
+                self.heartbeats_withheld += 1
+                if not withholding:
+                    withholding = True
+                    self.logger.warning("No fresh frame or control tick, withholding heartbeats")
+                continue
+            if withholding:
+                withholding = False
+                self.logger.info("Frames and control ticks are back, heartbeats resumed")
+            for channel in self.fleet:
+                sender.send(Command.HEARTBEAT, topic=channel.topic)
+
+    async def _status(self) -> None:
+        while True:
+            await asyncio.sleep(self.status_period_s)
+            for record in self._status_records.values():
+                self.logger.info(format_status(record))
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+
+class ColorSegmenter:
+    """
+    Compiles HSV ranges into a per-channel lookup table where every color owns
+    one bit. One cv2.LUT pass over the HSV frame and an AND of its three
+    channels produce a label image with the membership of all colors at once.
+    Up to 8 colors fit an 8-bit label image, up to 16 a 16-bit one.
+    """
+    MAX_COLORS = 16
+
+    def __init__(self, hsv_ranges: dict | None = None):
+        self.color_bits: dict[str, int] = {}
+        self._lut: np.ndarray | None = None
+        self._ranges_key: tuple | None = None
+        if hsv_ranges is not None:
+            self.compile(hsv_ranges)
+
+    def compile(self, hsv_ranges: dict) -> bool:
+        """
+        Rebuilds the lookup table if the ranges differ from the compiled ones.
+        Returns True when the table was rebuilt.
+        """
+        ranges_key = tuple((color, tuple(values)) for color, values in hsv_ranges.items())
+        if ranges_key == self._ranges_key:
+            return False
+        if len(hsv_ranges) > self.MAX_COLORS:
+            raise ValueError(f"At most {self.MAX_COLORS} colors are supported, got {len(hsv_ranges)}")
+
+        lut = np.zeros((256, 3), np.uint8 if len(hsv_ranges) <= 8 else np.uint16)
+        color_bits = {}
+        for bit, (color, values) in enumerate(hsv_ranges.items()):
+            flag = 1 << bit
+            for channel in range(3):
+                lower, upper = int(values[channel]), int(values[channel + 3])
+                lut[max(lower, 0):min(upper, 255) + 1, channel] |= flag
+            color_bits[color] = flag
+
+        self._lut = lut.reshape(1, 256, 3)
+        self.color_bits = color_bits
+        self._ranges_key = ranges_key
+        return True
+
+    def label(self, hsv_img: np.ndarray) -> np.ndarray:
+        h_bits, s_bits, v_bits = cv2.split(cv2.LUT(hsv_img, self._lut))
+        return cv2.bitwise_and(cv2.bitwise_and(h_bits, s_bits), v_bits)
+
+    def mask(self, labels: np.ndarray, color: str) -> np.ndarray:
+        flag = self.color_bits[color]
+        return cv2.compare(cv2.bitwise_and(labels, flag), 0, cv2.CMP_GT)
@@ -0,0 +1,121 @@
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+from system.control import MeasurementZone, RobotStates, TRANSITIONS
+
+STATE_ORDER = tuple(RobotStates)
+ZONE_ORDER = tuple(MeasurementZone)
+STATE_INDEX = {state: i for i, state in enumerate(STATE_ORDER)}
+ZONE_INDEX = {zone: i for i, zone in enumerate(ZONE_ORDER)}
+
+# TRANSITIONS as a (state, zone) -> next state index array
+TRANSITION_TABLE = np.array([[STATE_INDEX[TRANSITIONS[state][zone]] for zone in ZONE_ORDER] for state in STATE_ORDER],
+                            dtype=np.intp)
+# zone index of a measurement by (near, aligned)
+_MEASURED_ZONES = np.array([[ZONE_INDEX[MeasurementZone.FAR_MISALIGNED], ZONE_INDEX[MeasurementZone.FAR_ALIGNED]],
+                            [ZONE_INDEX[MeasurementZone.NEAR_MISALIGNED], ZONE_INDEX[MeasurementZone.NEAR_ALIGNED]]],
+                           dtype=np.intp)
+
+
+@dataclass
+class SweepResults:
+    """
+    Outcome of every (distance_tolerance, straight_angle_threshold) pair on
+    a (D, S) grid: the first step in GOAL_REACHED (-1 if never), the number
+    of state changes and the steps spent in each state (last axis in
+    STATE_ORDER).
+    """
+    distance_tolerances: np.ndarray
+    straight_angle_thresholds: np.ndarray
+    goal_step: np.ndarray
+    state_changes: np.ndarray
+    steps_in_state: np.ndarray
+
+    def best(self, count: int = 10) -> list[dict]:
+        """
+        The pairs that reach the goal soonest, fewer state changes first on ties.
+        """
+        goal_step = np.where(self.goal_step < 0, np.iinfo(np.int64).max, self.goal_step)
+        order = np.lexsort((self.state_changes.ravel(), goal_step.ravel()))[:count]
+        rows = []
+        for flat in order:
+            d, s = np.unravel_index(flat, self.goal_step.shape)
+            rows.append({
+                "distance_tolerance": float(self.distance_tolerances[d]),
+                "straight_angle_threshold": float(self.straight_angle_thresholds[s]),
+                "goal_step": int(self.goal_step[d, s]),
+                "state_changes": int(self.state_changes[d, s]),
+                "steps_in_state": {state.name: int(n) for state, n in zip(STATE_ORDER, self.steps_in_state[d, s])},
+            })
+        return rows
+
+
+def sweep_fsm(angles, distances, distance_tolerances, straight_angle_thresholds) -> SweepResults:
+    """
+    Runs the RobotNavigationFSM transition table over a recorded
+    angle/distance trace for every combination of the given thresholds in
+    one pass: the trace is walked once and each step updates the states of
+    all combinations with NumPy. NaN marks a step without a measurement.
+
+    The trace is replayed open loop: the measurements do not react to the
+    commands a different threshold would have produced, so the results rank
+    how each setting interprets the same motion.
+
+    angle_tolerance is not swept, because no transition depends on it.
+    """
+    angles = np.asarray(angles, dtype=float)
+    distances = np.asarray(distances, dtype=float)
+    distance_tolerances = np.asarray(distance_tolerances, dtype=float)
+    straight_angle_thresholds = np.asarray(straight_angle_thresholds, dtype=float)
+    if angles.shape != distances.shape or angles.ndim != 1:
+        raise ValueError("angles and distances must be 1-D arrays of the same length")
+
+    lost = np.isnan(angles) | np.isnan(distances)
+    # (T, D) and (T, S) tables of the conditions, computed for the whole trace at once
+    near = (distances[:, None] <= distance_tolerances[None, :]).astype(np.intp)
+    aligned = (np.abs(angles)[:, None] <= straight_angle_thresholds[None, :]).astype(np.intp)
+
+    shape = (len(distance_tolerances), len(straight_angle_thresholds))
+    state = np.full(shape, STATE_INDEX[RobotStates.IDLE], dtype=np.intp)
+    goal_step = np.full(shape, -1, dtype=np.int64)
+    state_changes = np.zeros(shape, dtype=np.int64)
+    steps_in_state = np.zeros(shape + (len(STATE_ORDER),), dtype=np.int64)
+    goal_index = STATE_INDEX[RobotStates.GOAL_REACHED]
+    lost_zone = ZONE_INDEX[MeasurementZone.LOST]
+    state_ids = np.arange(len(STATE_ORDER))
+
+    for t in range(len(angles)):
+        if lost[t]:
+            next_state = TRANSITION_TABLE[state, lost_zone]
+        else:
+            zone = _MEASURED_ZONES[near[t][:, None], aligned[t][None, :]]
+            next_state = TRANSITION_TABLE[state, zone]
+        state_changes += next_state != state
+        goal_step[(goal_step < 0) & (next_state == goal_index)] = t
+        steps_in_state += next_state[..., None] == state_ids
+        state = next_state
+
+    return SweepResults(distance_tolerances=distance_tolerances,
+                        straight_angle_thresholds=straight_angle_thresholds,
+                        goal_step=goal_step,
+                        state_changes=state_changes,
+                        steps_in_state=steps_in_state)
+
+
+def load_control_trace(path: str, robot: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the angle/distance trace of one robot from the control records
+    ControlRuntime dumps on SIGUSR1; ticks without an estimate become NaN.
+    """
+    angles, distances = [], []
+    with open(path) as records_file:
+        for line in records_file:
+            record = json.loads(line)
+            if record.get("type") != "control" or record.get("robot") != robot:
+                continue
+            angle, distance = record.get("angle_deg"), record.get("distance")
+            angles.append(np.nan if angle is None else angle)
+            distances.append(np.nan if distance is None else distance)
+    return np.array(angles, dtype=float), np.array(distances, dtype=float)